@@ -0,0 +1,182 @@
+import array
+import gzip
+import mmap
+import os
+import re
+import sys
+import zlib
+
+SECTOR_SIZE = 4096
+HEADER_SIZE = 2 * SECTOR_SIZE
+REGION_WIDTH = 32
+CHUNK_COUNT = REGION_WIDTH * REGION_WIDTH
+CHUNK_HEADER_SIZE = 5
+
+COMPRESSION_GZIP = 1
+COMPRESSION_ZLIB = 2
+COMPRESSION_NONE = 3
+EXTERNAL_FLAG = 128
+
+REGION_FILENAME_PATTERN = re.compile(r'^r\.(-?\d+)\.(-?\d+)\.mca$')
+
+
+def read_header_array(data, offset):
+
+    # Read 1024 big endian integers from the header
+    values = array.array('I')
+    if values.itemsize != 4:
+        values = array.array('L')
+    values.frombytes(data[offset:offset + CHUNK_COUNT * 4])
+    if sys.byteorder == 'little':
+        values.byteswap()
+    return values
+
+
+def get_chunk_index(x, z):
+    return (x % REGION_WIDTH) + (z % REGION_WIDTH) * REGION_WIDTH
+
+
+def decompress_chunk(compression, data):
+    match compression:
+        case 1:
+            return gzip.decompress(data)
+        case 2:
+            return zlib.decompress(data)
+        case 3:
+            return bytes(data)
+    raise RuntimeError('Unsupported chunk compression type ' + str(compression))
+
+
+class RegionFile:
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self.file = None
+        self.data = b''
+
+        # Find the region coordinates from the filename, if it follows the naming convention
+        match = REGION_FILENAME_PATTERN.match(os.path.basename(filepath))
+        self.region_x = int(match.group(1)) if match is not None else None
+        self.region_z = int(match.group(2)) if match is not None else None
+
+        # Map the region file into memory, treating an empty file as a region without chunks
+        self.file = open(filepath, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        if self.size > 0:
+            if self.size < HEADER_SIZE:
+                self.close()
+                raise RuntimeError('Region file \"' + filepath + '\" is truncated')
+            self.data = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.locations = read_header_array(self.data, 0)
+            self.timestamps = read_header_array(self.data, CHUNK_COUNT * 4)
+        else:
+            self.locations = read_header_array(bytes(HEADER_SIZE), 0)
+            self.timestamps = read_header_array(bytes(HEADER_SIZE), CHUNK_COUNT * 4)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exception_type, exception, traceback):
+        self.close()
+
+    def close(self):
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.data = b''
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def has_chunk(self, x, z):
+        return self.locations[get_chunk_index(x, z)] != 0
+
+    def chunks(self):
+        return [(index % REGION_WIDTH, index // REGION_WIDTH) for index in range(CHUNK_COUNT) if self.locations[index] != 0]
+
+    def get_offset(self, x, z):
+        return (self.locations[get_chunk_index(x, z)] >> 8) * SECTOR_SIZE
+
+    def get_sector_count(self, x, z):
+        return self.locations[get_chunk_index(x, z)] & 0xFF
+
+    def get_timestamp(self, x, z):
+        return self.timestamps[get_chunk_index(x, z)]
+
+    def get_chunk_position(self, x, z):
+
+        # Convert local chunk coordinates to world chunk coordinates
+        if self.region_x is None:
+            return None
+        return self.region_x * REGION_WIDTH + x % REGION_WIDTH, self.region_z * REGION_WIDTH + z % REGION_WIDTH
+
+    def get_external_filepath(self, x, z):
+
+        # Raise error if the region's position, which names its external chunk files, can't be read from its filename
+        position = self.get_chunk_position(x, z)
+        if position is None:
+            raise RuntimeError('Region file \"' + self.filepath + '\" isn\'t named like r.<x>.<z>.mca, so the external file of chunk ' + str(x) + ', ' + str(z) + ' can\'t be found')
+        chunk_x, chunk_z = position
+        return os.path.join(os.path.dirname(self.filepath), 'c.' + str(chunk_x) + '.' + str(chunk_z) + '.mcc')
+
+    def read_chunk_header(self, x, z):
+
+        # Read only the length and compression type that start the chunk
+        if not self.has_chunk(x, z):
+            return None
+        offset = self.get_offset(x, z)
+        if offset < HEADER_SIZE or offset + CHUNK_HEADER_SIZE > self.size:
+            raise RuntimeError('Chunk ' + str(x) + ', ' + str(z) + ' of \"' + self.filepath + '\" is outside the region file')
+        length = int.from_bytes(self.data[offset:offset + 4], 'big')
+        return length, self.data[offset + 4]
+
+    def get_chunk_size(self, x, z):
+        header = self.read_chunk_header(x, z)
+        return header[0] - 1 if header is not None else 0
+
+    def get_compression(self, x, z):
+        header = self.read_chunk_header(x, z)
+        return header[1] & ~EXTERNAL_FLAG if header is not None else None
+
+    def is_external(self, x, z):
+        header = self.read_chunk_header(x, z)
+        return header is not None and header[1] & EXTERNAL_FLAG != 0
+
+    def read_chunk_data(self, x, z):
+
+        header = self.read_chunk_header(x, z)
+        if header is None:
+            return None
+        length, compression = header
+
+        # Read oversized chunks from their own file next to the region file
+        if compression & EXTERNAL_FLAG:
+            with open(self.get_external_filepath(x, z), 'rb') as external_file:
+                return compression & ~EXTERNAL_FLAG, external_file.read()
+
+        start = self.get_offset(x, z) + CHUNK_HEADER_SIZE
+        if start + length - 1 > self.size:
+            raise RuntimeError('Chunk ' + str(x) + ', ' + str(z) + ' of \"' + self.filepath + '\" is truncated')
+        return compression, memoryview(self.data)[start:start + length - 1]
+
+    def read_chunk(self, x, z):
+
+        # Decompress a single chunk on demand
+        chunk_data = self.read_chunk_data(x, z)
+        if chunk_data is None:
+            return None
+        compression, data = chunk_data
+        try:
+            return decompress_chunk(compression, data)
+        finally:
+            if isinstance(data, memoryview):
+                data.release()
+
+
+def find_region_files(world_directory):
+
+    # Find the region files of every dimension, including the entity and point of interest regions
+    region_files = []
+    for root, dirs, filenames in os.walk(world_directory):
+        dirs.sort()
+        region_files.extend(os.path.join(root, filename) for filename in sorted(filenames) if filename.endswith('.mca'))
+    return region_files
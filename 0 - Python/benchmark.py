@@ -0,0 +1,230 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+
+import anvil
+import catalog
+import chunkpack
+import functions
+import graph
+import materialize
+import nbt
+
+
+def create_synthetic_mods(project_directory, mod_count):
+
+    # Split the synthetic mods between the content and dependency mod directories
+    for index in range(mod_count):
+        if index % 4 == 0:
+            mod_directory = os.path.join(project_directory, catalog.DEPENDENCY_MODS_DIRECTORY, 'Mod ' + str(index))
+        else:
+            mod_directory = os.path.join(project_directory, catalog.CONTENT_MODS_DIRECTORY, 'Mod ' + str(index))
+        os.makedirs(mod_directory)
+
+        # Give every mod a few dependencies on earlier dependency mods
+        dependencies = ['Mod ' + str(dependency) for dependency in range(0, index, 4)][-3:]
+        with open(os.path.join(mod_directory, 'data.json'), 'w') as data:
+            data.write(json.dumps({'Client': True, 'Server': True, 'Dependencies': dependencies}))
+
+
+def benchmark_mod_catalog():
+
+    functions.log_info('Mod catalog lookup benchmark')
+    for mod_count in (100, 1000, 5000, 10000):
+        with tempfile.TemporaryDirectory() as project_directory:
+            create_synthetic_mods(project_directory, mod_count)
+
+            # Time the single scan of both mod directories
+            start = time.perf_counter()
+            mod_catalog = catalog.ModCatalog(project_directory)
+            scan_time = time.perf_counter() - start
+
+            # Time a fixed number of random lookups against the index
+            lookups = ['Mod ' + str(random.randrange(mod_count)) for _ in range(100000)]
+            start = time.perf_counter()
+            for mod_name in lookups:
+                mod_catalog.get(mod_name)
+            lookup_time = time.perf_counter() - start
+
+        functions.log_info(
+            str(mod_count).rjust(6) + ' mods: scan ' + format(scan_time * 1000, '.1f') + ' ms, lookup '
+            + format(lookup_time / len(lookups) * 1e9, '.0f') + ' ns')
+
+
+def benchmark_mod_graph():
+
+    functions.log_info('Mod graph query benchmark')
+    for mod_count in (100, 1000, 5000):
+        with tempfile.TemporaryDirectory() as project_directory:
+            create_synthetic_mods(project_directory, mod_count)
+            mod_catalog = catalog.ModCatalog(project_directory)
+
+        # Time precomputing the closures
+        start = time.perf_counter()
+        mod_graph = graph.ModGraph(mod_catalog)
+        build_time = time.perf_counter() - start
+
+        # Time a fixed number of random queries against the closures
+        mod_names = ['Mod ' + str(random.randrange(mod_count)) for _ in range(1000)]
+        start = time.perf_counter()
+        for mod_name in mod_names:
+            mod_graph.dependents(mod_name, True)
+        dependents_time = time.perf_counter() - start
+        start = time.perf_counter()
+        for mod_name in mod_names:
+            mod_graph.disable_impact([mod_name])
+        impact_time = time.perf_counter() - start
+
+        functions.log_info(
+            str(mod_count).rjust(6) + ' mods: build ' + format(build_time * 1000, '.1f') + ' ms, dependents '
+            + format(dependents_time / len(mod_names) * 1e6, '.1f') + ' us, impact '
+            + format(impact_time / len(mod_names) * 1e6, '.1f') + ' us')
+
+
+def create_synthetic_tree(directory):
+
+    operations = []
+
+    def add_file(relative_path, size):
+        filepath = os.path.join(directory, relative_path)
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        with open(filepath, 'wb') as f:
+            f.write(os.urandom(size))
+        operations.append((filepath, relative_path))
+
+    # Shape the tree like the project: many small config files, some jars and a few large region files
+    for index in range(2000):
+        add_file(os.path.join('config', 'mod ' + str(index // 20), 'config ' + str(index) + '.toml'), random.randrange(200, 8000))
+    for index in range(200):
+        add_file(os.path.join('mods', 'mod ' + str(index) + '.jar'), random.randrange(50000, 2000000))
+    for index in range(20):
+        add_file(os.path.join('saves', 'Flat World', 'region', 'r.' + str(index) + '.0.mca'), 3153920)
+
+    return operations
+
+
+def benchmark_copy_engine():
+
+    functions.log_info('Copy engine worker benchmark')
+    with tempfile.TemporaryDirectory() as directory:
+        operations = create_synthetic_tree(os.path.join(directory, 'source'))
+        total_size = sum(os.path.getsize(source) for source, relative_path in operations)
+
+        for workers in (1, 4, 8, 16):
+
+            # Copy the whole tree into a fresh destination
+            destination_directory = os.path.join(directory, 'destination ' + str(workers))
+            start = time.perf_counter()
+            results, errors = materialize.materialize_files(
+                [(source, os.path.join(destination_directory, relative_path)) for source, relative_path in operations],
+                'copy',
+                workers)
+            copy_time = time.perf_counter() - start
+
+            functions.log_info(
+                str(workers).rjust(2) + ' workers: ' + str(len(results)) + ' files, ' + format(total_size / 1e6, '.0f') + ' MB in '
+                + format(copy_time, '.2f') + ' s (' + format(total_size / 1e6 / copy_time, '.0f') + ' MB/s)')
+
+
+def benchmark_region_reader():
+
+    functions.log_info('Region reader benchmark')
+    region_files = anvil.find_region_files(os.path.join(functions.get_project_directory(), '1 - Instance Core', 'saves', 'Flat World'))
+    total_size = sum(os.path.getsize(filepath) for filepath in region_files)
+
+    # Time indexing every chunk from the region headers alone
+    start = time.perf_counter()
+    chunk_count = 0
+    for filepath in region_files:
+        with anvil.RegionFile(filepath) as region_file:
+            for x, z in region_file.chunks():
+                region_file.get_chunk_size(x, z)
+                chunk_count += 1
+    index_time = time.perf_counter() - start
+
+    # Time decompressing every chunk
+    start = time.perf_counter()
+    decompressed_size = 0
+    for filepath in region_files:
+        with anvil.RegionFile(filepath) as region_file:
+            for x, z in region_file.chunks():
+                decompressed_size += len(region_file.read_chunk(x, z))
+    decompress_time = time.perf_counter() - start
+
+    functions.log_info(
+        str(len(region_files)) + ' region files, ' + str(chunk_count) + ' chunks, ' + format(total_size / 1e6, '.0f') + ' MB: index '
+        + format(index_time * 1000, '.1f') + ' ms, decompress ' + format(decompress_time, '.2f') + ' s ('
+        + format(total_size / 1e6 / decompress_time, '.0f') + ' MB/s compressed, ' + format(decompressed_size / 1e6 / decompress_time, '.0f')
+        + ' MB/s decompressed)')
+
+
+def benchmark_nbt():
+
+    functions.log_info('NBT codec benchmark')
+    data = nbt.read_file(os.path.join(functions.get_project_directory(), '1 - Instance Core', 'saves', 'Flat World', 'level.dat'))[0]
+    repeats = 20
+
+    # Time streaming through every tag without building a tree
+    start = time.perf_counter()
+    for _ in range(repeats):
+        event_count = sum(1 for _ in nbt.iter_events(data))
+    event_time = (time.perf_counter() - start) / repeats
+
+    # Time looking up a few values, skipping everything else
+    start = time.perf_counter()
+    for _ in range(repeats):
+        nbt.read_values(data, ('LevelName', 'SpawnX', 'SpawnZ', 'LastPlayed'), ('Data',))
+    lookup_time = (time.perf_counter() - start) / repeats
+
+    # Time reading the whole tree and writing it back
+    start = time.perf_counter()
+    for _ in range(repeats):
+        name, tag = nbt.read_tag(data)
+    read_time = (time.perf_counter() - start) / repeats
+    start = time.perf_counter()
+    for _ in range(repeats):
+        written_data = nbt.write_tag(name, tag)
+    write_time = (time.perf_counter() - start) / repeats
+    if written_data != data:
+        raise RuntimeError('Rewritten level.dat doesn\'t match the original')
+
+    functions.log_info(
+        'level.dat, ' + format(len(data) / 1024, '.0f') + ' KB, ' + str(event_count) + ' events: stream ' + format(event_time * 1000, '.1f')
+        + ' ms (' + format(len(data) / 1e6 / event_time, '.0f') + ' MB/s), lookup ' + format(lookup_time * 1000, '.2f') + ' ms, read '
+        + format(read_time * 1000, '.1f') + ' ms (' + format(len(data) / 1e6 / read_time, '.0f') + ' MB/s), write '
+        + format(write_time * 1000, '.1f') + ' ms (' + format(len(data) / 1e6 / write_time, '.0f') + ' MB/s)')
+
+
+def benchmark_chunk_pack():
+
+    functions.log_info('Chunk pack benchmark')
+    world_directory = os.path.join(functions.get_project_directory(), '1 - Instance Core', 'saves', 'Flat World')
+
+    # Time copying the chunk regions as they are stored
+    region_files = anvil.find_region_files(os.path.join(world_directory, 'region'))
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        for filepath in region_files:
+            shutil.copyfile(filepath, os.path.join(directory, os.path.basename(filepath)))
+        copy_time = time.perf_counter() - start
+
+    # Compare the size of each pack and the time to rebuild its region files against storing and copying them
+    for name, region_count, template_count, chunk_count, source_size, pack_size, synthesize_time in chunkpack.pack_world(world_directory):
+        functions.log_info(
+            name + ': ' + str(chunk_count) + ' chunks, ' + str(template_count) + ' templates: stored ' + format(source_size / 1e6, '.1f') + ' MB -> '
+            + format(pack_size / 1e6, '.2f') + ' MB, copy ' + format(copy_time, '.2f') + ' s -> rebuild ' + format(synthesize_time, '.2f') + ' s')
+
+
+def run():
+    benchmark_mod_catalog()
+    benchmark_mod_graph()
+    benchmark_copy_engine()
+    benchmark_region_reader()
+    benchmark_nbt()
+    benchmark_chunk_pack()
+
+
+run()
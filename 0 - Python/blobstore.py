@@ -0,0 +1,159 @@
+import argparse
+import json
+import os
+import shutil
+import threading
+
+import manifest
+import materialize
+
+BUILDS_FILENAME = 'builds.json'
+OBJECTS_DIRECTORY = 'objects'
+
+
+class BlobStore:
+
+    def __init__(self, directory):
+        self.directory = directory
+
+    def get_blob_filepath(self, file_hash):
+        return os.path.join(self.directory, OBJECTS_DIRECTORY, file_hash[0:2], file_hash)
+
+    def add(self, source, file_hash):
+
+        # Store each version of a file once, the first time it is seen
+        blob_filepath = self.get_blob_filepath(file_hash)
+        if os.path.isfile(blob_filepath):
+            return blob_filepath
+
+        # Copy to a temporary file first so an interrupted copy never leaves a partial blob behind
+        os.makedirs(os.path.dirname(blob_filepath), exist_ok=True)
+        temporary_filepath = blob_filepath + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'
+        try:
+            shutil.copyfile(source, temporary_filepath)
+            os.replace(temporary_filepath, blob_filepath)
+        finally:
+            if os.path.exists(temporary_filepath):
+                os.remove(temporary_filepath)
+        return blob_filepath
+
+    def link(self, filepath, file_hash, link_any_file=False):
+
+        # Add a file to the store by linking it, hard linking only files the game never writes to in place
+        blob_filepath = self.get_blob_filepath(file_hash)
+        if os.path.isfile(blob_filepath):
+            return blob_filepath
+        strategies = ('hardlink', 'reflink') if link_any_file or filepath.lower().endswith(materialize.LINKABLE_EXTENSIONS) else ('reflink',)
+        os.makedirs(os.path.dirname(blob_filepath), exist_ok=True)
+        temporary_filepath = blob_filepath + '.' + str(os.getpid()) + '.' + str(threading.get_ident()) + '.tmp'
+        for strategy in strategies:
+            try:
+                materialize.STRATEGY_FUNCTIONS[strategy](filepath, temporary_filepath)
+                os.replace(temporary_filepath, blob_filepath)
+                return blob_filepath
+            except OSError:
+                materialize.remove_file(temporary_filepath)
+
+        # Leave out a file that can't be stored without copying it again
+        return None
+
+    def materialize_file(self, source, destination, strategy, hasher, link_any_file=False):
+
+        # Link a file the store already holds from its blob, cloning rather than copying it where the filesystem allows
+        file_hash = hasher.hash(source)
+        blob_filepath = self.get_blob_filepath(file_hash)
+        link_strategy = 'reflink' if strategy == 'copy' else strategy
+        if os.path.isfile(blob_filepath):
+            return materialize.materialize_file(blob_filepath, destination, link_strategy, link_any_file)
+
+        # Link a new file the build will link to into the store, copying it in only when it can't be linked
+        if strategy in ('hardlink', 'symlink') and (link_any_file or destination.lower().endswith(materialize.LINKABLE_EXTENSIONS)):
+            blob_filepath = self.link(source, file_hash, True)
+            return materialize.materialize_file(blob_filepath if blob_filepath is not None else self.add(source, file_hash), destination, strategy, link_any_file)
+
+        # Otherwise write the new file once into the build and link that copy into the store
+        used_strategy = materialize.materialize_file(source, destination, link_strategy, link_any_file)
+        self.link(destination, file_hash, link_any_file)
+        return used_strategy
+
+    def load_builds(self):
+        try:
+            with open(os.path.join(self.directory, BUILDS_FILENAME), 'r') as data:
+                return json.load(data)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+    def record_build(self, directory):
+
+        # Remember every directory built from the store so its manifest keeps its blobs alive
+        builds = self.load_builds()
+        if directory not in builds:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, BUILDS_FILENAME), 'w') as data:
+                data.write(json.dumps(sorted(builds + [directory]), indent=4))
+
+    def get_refcounts(self):
+
+        # Count the files of every recorded build manifest that use each blob, skipping builds that have since been removed
+        refcounts = {}
+        builds = []
+        for directory in self.load_builds():
+            try:
+                with open(os.path.join(directory, manifest.MANIFEST_FILENAME), 'r') as data:
+                    files = json.load(data)['Files']
+            except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+                continue
+            builds.append(directory)
+            for entry in files.values():
+                refcounts[entry['Hash']] = refcounts.get(entry['Hash'], 0) + 1
+        return refcounts, builds
+
+    def list_blobs(self):
+        objects_directory = os.path.join(self.directory, OBJECTS_DIRECTORY)
+        if not os.path.isdir(objects_directory):
+            return []
+        return [os.path.join(root, filename) for root, dirs, filenames in os.walk(objects_directory) for filename in filenames]
+
+    def collect_garbage(self):
+
+        # Remove every blob no recorded build uses, along with partial blobs left by interrupted builds
+        refcounts, builds = self.get_refcounts()
+        removed_blobs = 0
+        removed_size = 0
+        for blob_filepath in self.list_blobs():
+            if refcounts.get(os.path.basename(blob_filepath), 0) == 0:
+                removed_size += os.path.getsize(blob_filepath)
+                os.remove(blob_filepath)
+                removed_blobs += 1
+
+        # Forget the builds that no longer exist
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, BUILDS_FILENAME), 'w') as data:
+            data.write(json.dumps(sorted(builds), indent=4))
+        return removed_blobs, removed_size
+
+
+def run():
+
+    parser = argparse.ArgumentParser(description='Report on or remove unused blobs from a blob store')
+    parser.add_argument('action', choices=('stats', 'gc'), help='report the blobs in use or remove the unused blobs')
+    parser.add_argument('store', help='blob store folder')
+    arguments = parser.parse_args()
+    blob_store = BlobStore(arguments.store)
+
+    if arguments.action == 'gc':
+        removed_blobs, removed_size = blob_store.collect_garbage()
+        print('Removed ' + str(removed_blobs) + ' unused blobs (' + format(removed_size / 1e6, '.1f') + ' MB)')
+        return
+
+    # Report how many blobs each recorded build uses and how many files share them
+    refcounts, builds = blob_store.get_refcounts()
+    blob_filepaths = blob_store.list_blobs()
+    used_blobs = [filepath for filepath in blob_filepaths if os.path.basename(filepath) in refcounts]
+    print(str(len(builds)) + ' builds: ' + str(len(used_blobs)) + ' of ' + str(len(blob_filepaths)) + ' blobs in use by '
+          + str(sum(refcounts.get(os.path.basename(filepath), 0) for filepath in used_blobs)) + ' files, '
+          + format(sum(os.path.getsize(filepath) for filepath in blob_filepaths) / 1e6, '.1f') + ' MB stored')
+
+
+if __name__ == '__main__':
+    run()
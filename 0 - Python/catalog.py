@@ -0,0 +1,198 @@
+import json
+import os
+
+import ignore
+
+CONTENT_MODS_DIRECTORY = os.path.join('3 - Content Mods', 'Enabled')
+STORAGE_MODS_DIRECTORY = os.path.join('3 - Content Mods', 'Storage')
+DEPENDENCY_MODS_DIRECTORY = '4 - Dependency Mods'
+MOD_DATA_FILENAME = 'data.json'
+
+
+def stat_file(filepath):
+    try:
+        stat = os.stat(filepath)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def list_mod_directory(mod_directory, matchers=()):
+
+    # List every file in the mod's folders that isn't ignored, along with the modification time of each folder and the stats of each ignore file
+    relative_files = []
+    directories = {}
+    ignore_files = {}
+    for root, dirs, filenames in ignore.walk(mod_directory, matchers):
+        directories[os.path.relpath(root, mod_directory)] = os.stat(root).st_mtime_ns
+        ignore_file_stat = stat_file(os.path.join(root, ignore.IGNORE_FILENAME))
+        if ignore_file_stat is not None:
+            ignore_files[os.path.relpath(os.path.join(root, ignore.IGNORE_FILENAME), mod_directory)] = ignore_file_stat
+        if root != mod_directory:
+            relative_files.extend(os.path.relpath(os.path.join(root, filename), mod_directory) for filename in filenames)
+    return relative_files, directories, ignore_files
+
+
+class Mod:
+
+    def __init__(self, name, directory, enabled, data, relative_files=None, matchers=()):
+        self.name = name
+        self.directory = directory
+        self.enabled = enabled
+        self.client = data['Client']
+        self.server = data['Server']
+        self.dependencies = data['Dependencies']
+        self.file_sides = data.get('File Sides', {})
+        self.relative_files = relative_files
+        self.matchers = matchers
+        self.files = None
+
+    def get_relative_files(self):
+        if self.relative_files is None:
+            self.relative_files = list_mod_directory(self.directory, self.matchers)[0]
+        return self.relative_files
+
+    def is_available(self, side):
+        if side == 'Client':
+            return self.client
+        if side == 'Server':
+            return self.server
+        return True
+
+
+class MetadataCache:
+
+    def __init__(self, filepath, settings=None):
+        self.filepath = filepath
+        self.settings = settings
+        self.mods = {}
+        self.changed = False
+
+    def load(self):
+
+        # Treat a missing or unreadable cache as empty
+        try:
+            with open(self.filepath, 'r') as data:
+                cache_data = json.load(data)
+            self.mods = cache_data['Mods']
+            settings = cache_data.get('Settings')
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError, AttributeError):
+            self.mods = {}
+            return
+
+        # Treat a cache written with different settings, such as different ignore files, as empty
+        if settings != self.settings:
+            self.mods = {}
+            self.changed = True
+
+    def save(self, mod_directories):
+
+        # Forget mods that are no longer in the project
+        for mod_directory in [mod_directory for mod_directory in self.mods if mod_directory not in mod_directories]:
+            del self.mods[mod_directory]
+            self.changed = True
+
+        if self.changed:
+            with open(self.filepath, 'w') as data:
+                data.write(json.dumps({'Settings': self.settings, 'Mods': self.mods}, separators=(',', ':')))
+            self.changed = False
+
+    def get(self, key, mod_directory):
+
+        entry = self.mods.get(key)
+        if entry is None:
+            return None
+
+        # Check the mod data file and every mod folder are unchanged since they were cached
+        if stat_file(os.path.join(mod_directory, MOD_DATA_FILENAME)) != entry['Data']:
+            return None
+        for relative_directory, modified in entry['Directories'].items():
+            directory_stat = stat_file(os.path.join(mod_directory, relative_directory))
+            if directory_stat is None or directory_stat[1] != modified:
+                return None
+
+        # Editing an ignore file doesn't change its folder, so check each one the mod's files were listed with
+        if 'Ignore Files' not in entry:
+            return None
+        for relative_path, ignore_file_stat in entry['Ignore Files'].items():
+            if stat_file(os.path.join(mod_directory, relative_path)) != ignore_file_stat:
+                return None
+        return entry
+
+    def set(self, key, data_stat, mod_data, relative_files, directories, ignore_files):
+        self.mods[key] = {
+            'Data': data_stat,
+            'Client': mod_data['Client'],
+            'Server': mod_data['Server'],
+            'Dependencies': mod_data['Dependencies'],
+            'File Sides': mod_data.get('File Sides', {}),
+            'Files': relative_files,
+            'Directories': directories,
+            'Ignore Files': ignore_files}
+        self.changed = True
+
+
+class ModCatalog:
+
+    def __init__(self, project_directory, cache=None):
+        self.project_directory = project_directory
+        self.cache = cache
+        self.mods = {}
+        self.changed_mods = 0
+
+        # Index content mods before dependency mods so a content mod takes priority over a dependency mod of the same name
+        self.index_directory(os.path.join(project_directory, CONTENT_MODS_DIRECTORY), True)
+        self.index_directory(os.path.join(project_directory, DEPENDENCY_MODS_DIRECTORY), False)
+
+        # Note the names of stored mods so a dependency on a disabled mod can be reported as such
+        storage_directory = os.path.join(project_directory, STORAGE_MODS_DIRECTORY)
+        if os.path.isdir(storage_directory):
+            self.storage_mod_names = {mod.name for mod in os.scandir(storage_directory) if mod.is_dir()}
+        else:
+            self.storage_mod_names = set()
+
+    def index_directory(self, directory, enabled):
+
+        # Load the data file of every mod in the directory that isn't ignored exactly once
+        matchers = ignore.load_matchers(self.project_directory, directory, True)
+        for mod in sorted(os.scandir(directory), key=lambda entry: entry.name):
+            if mod.is_dir() and mod.name not in self.mods and not any(matcher.is_ignored(mod.path, True) for matcher in matchers):
+                self.mods[mod.name] = self.load_mod(mod.name, mod.path, enabled, matchers)
+
+    def load_mod(self, mod_name, mod_directory, enabled, matchers=()):
+
+        # Load the mod from the cache if it hasn't changed since the last run
+        if self.cache is None:
+            with open(os.path.join(mod_directory, MOD_DATA_FILENAME), 'r') as data:
+                return Mod(mod_name, mod_directory, enabled, json.load(data), None, matchers)
+        key = os.path.relpath(mod_directory, self.project_directory)
+        entry = self.cache.get(key, mod_directory)
+        if entry is not None:
+            return Mod(mod_name, mod_directory, enabled, entry, entry['Files'], matchers)
+
+        # Load the mod data file and list the mod files, then cache them
+        data_stat = stat_file(os.path.join(mod_directory, MOD_DATA_FILENAME))
+        with open(os.path.join(mod_directory, MOD_DATA_FILENAME), 'r') as data:
+            mod_data = json.load(data)
+        relative_files, directories, ignore_files = list_mod_directory(mod_directory, matchers)
+        self.cache.set(key, data_stat, mod_data, relative_files, directories, ignore_files)
+        self.changed_mods += 1
+        return Mod(mod_name, mod_directory, enabled, mod_data, relative_files, matchers)
+
+    def save_cache(self):
+        if self.cache is not None:
+            self.cache.save({os.path.relpath(mod.directory, self.project_directory) for mod in self.mods.values()})
+
+    def get(self, mod_name):
+
+        # Raise error if the mod could not be found
+        mod = self.mods.get(mod_name)
+        if mod is None:
+            raise RuntimeError('Required mod \"' + mod_name + '\" is missing from project')
+        return mod
+
+    def enabled_mods(self):
+        return [mod for mod in self.mods.values() if mod.enabled]
+
+    def dependency_mods(self):
+        return [mod for mod in self.mods.values() if not mod.enabled]
@@ -0,0 +1,196 @@
+import argparse
+import os
+import re
+
+import catalog
+import overlay
+
+CHANGELOG_HEADER = '-------- Change Log --------'
+CHANGE_PATTERN = re.compile(r'^line (\d+) :: (.*?)(?: \((.*) -> (.*)\))?$')
+
+
+class Change:
+
+    def __init__(self, filename, text, line_number=None, description=None, old_value=None, new_value=None):
+        self.filename = filename
+        self.text = text
+        self.line_number = line_number
+        self.description = description if description is not None else text
+        self.old_value = old_value
+        self.new_value = new_value
+
+    def is_patch(self):
+        return self.line_number is not None and self.old_value is not None
+
+    def describe(self):
+        return '\"' + self.filename + '\" ' + self.text
+
+
+def parse_change(filename, text):
+
+    # Only changes naming a line and the old and new values can be applied
+    match = CHANGE_PATTERN.match(text)
+    if match is None:
+        return Change(filename, text)
+    line_number, description, old_value, new_value = match.groups()
+    return Change(filename, text, int(line_number), description, old_value, new_value)
+
+
+def parse_changelog(filepath):
+
+    changes = {}
+    filename = None
+
+    with open(filepath, 'r', encoding='utf-8') as changelog:
+        for line in changelog:
+            text = line.strip()
+            if len(text) == 0 or text == CHANGELOG_HEADER:
+                continue
+
+            # Unindented lines name the config file the indented lines below them describe
+            if not line[0].isspace():
+                filename = os.path.normpath(text)
+                changes.setdefault(filename, [])
+            elif filename is None:
+                raise RuntimeError('Change \"' + text + '\" in \"' + filepath + '\" doesn\'t follow a config filename')
+            else:
+                changes[filename].append(parse_change(filename, text))
+
+    return changes
+
+
+def apply_changes(lines, changes):
+
+    lines = list(lines)
+    stale_changes = []
+
+    # Replace the old value on each changed line, keeping every change whose old value is no longer there and skipping notes
+    for change in changes:
+        if not change.is_patch():
+            continue
+        if change.line_number > len(lines):
+            stale_changes.append(change)
+            continue
+        line = lines[change.line_number - 1]
+        start, separator, end = line.rpartition(change.old_value)
+        if len(separator) == 0:
+            stale_changes.append(change)
+            continue
+        lines[change.line_number - 1] = start + change.new_value + end
+
+    return lines, stale_changes
+
+
+def find_drifted_changes(lines, changes):
+
+    # A stored config has drifted from its changelog when a changed line no longer holds the new value
+    drifted_changes = []
+    for change in changes:
+        if change.is_patch() and (change.line_number > len(lines) or change.new_value not in lines[change.line_number - 1]):
+            drifted_changes.append(change)
+    return drifted_changes
+
+
+def read_lines(filepath):
+    with open(filepath, 'r', encoding='utf-8', newline='') as config:
+        return config.read().splitlines(keepends=True)
+
+
+def write_lines(filepath, lines):
+
+    # Leave an unchanged file untouched so it isn't treated as a new source file
+    content = ''.join(lines)
+    if os.path.isfile(filepath):
+        with open(filepath, 'r', encoding='utf-8', newline='') as config:
+            if config.read() == content:
+                return
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, 'w', encoding='utf-8', newline='') as config:
+        config.write(content)
+
+
+def find_changelogs(directory):
+
+    # Yield each config folder of a mod or core folder along with its parsed changelog
+    for config_directory in overlay.CONFIG_DIRECTORIES:
+        filepath = os.path.join(directory, config_directory, overlay.CHANGELOG_FILENAME)
+        if os.path.isfile(filepath):
+            yield config_directory, parse_changelog(filepath)
+
+
+def patch_configs(directory, default_directory, output_directory):
+
+    files = []
+    stale_changes = []
+
+    # Patch the upstream default of every changed config file the folder stores only as a changelog, treating a missing default as stale
+    for config_directory, changes in find_changelogs(directory):
+        for filename, file_changes in changes.items():
+            relative_path = os.path.join(config_directory, filename)
+            if os.path.isfile(os.path.join(directory, relative_path)):
+                continue
+            default_filepath = os.path.join(default_directory, relative_path)
+            if not os.path.isfile(default_filepath):
+                stale_changes.extend(change for change in file_changes if change.is_patch())
+                continue
+
+            lines, file_stale_changes = apply_changes(read_lines(default_filepath), file_changes)
+            stale_changes.extend(file_stale_changes)
+            output_filepath = os.path.join(output_directory, relative_path)
+            write_lines(output_filepath, lines)
+            files.append((output_filepath, relative_path))
+
+    return files, stale_changes
+
+
+def check_project(project_directory, default_directory=None):
+
+    # Find every changelog in the core and mod folders
+    directories = [os.path.join(project_directory, '1 - Instance Core'), os.path.join(project_directory, '2 - Server Core')]
+    for mods_directory in (catalog.CONTENT_MODS_DIRECTORY, catalog.STORAGE_MODS_DIRECTORY, catalog.DEPENDENCY_MODS_DIRECTORY):
+        if os.path.isdir(os.path.join(project_directory, mods_directory)):
+            directories.extend(sorted(mod.path for mod in os.scandir(os.path.join(project_directory, mods_directory)) if mod.is_dir()))
+
+    patch_count = 0
+    note_count = 0
+    problems = []
+    for directory in directories:
+        for config_directory, changes in find_changelogs(directory):
+            for filename, file_changes in changes.items():
+                relative_path = os.path.join(config_directory, filename)
+                name = os.path.relpath(directory, project_directory)
+                patch_count += len([change for change in file_changes if change.is_patch()])
+                note_count += len([change for change in file_changes if not change.is_patch()])
+
+                # Check stored configs still hold each new value and upstream defaults still hold each old value
+                stored_filepath = os.path.join(directory, relative_path)
+                if os.path.isfile(stored_filepath):
+                    for change in find_drifted_changes(read_lines(stored_filepath), file_changes):
+                        problems.append(name + ': stored config has drifted from ' + change.describe())
+                if default_directory is None or not os.path.isfile(os.path.join(default_directory, relative_path)):
+                    if not os.path.isfile(stored_filepath):
+                        problems.append(name + ': \"' + relative_path + '\" is only stored as a changelog and has no default')
+                else:
+                    for change in apply_changes(read_lines(os.path.join(default_directory, relative_path)), file_changes)[1]:
+                        problems.append(name + ': stale change ' + change.describe())
+
+    return patch_count, note_count, problems
+
+
+def run():
+
+    parser = argparse.ArgumentParser(description='Check every config changelog in the project')
+    parser.add_argument('--defaults', help='directory of upstream default configs to check old values against')
+    arguments = parser.parse_args()
+
+    # Report every change that no longer matches its config
+    patch_count, note_count, problems = check_project(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), arguments.defaults)
+    print('Found ' + str(patch_count) + ' line changes and ' + str(note_count) + ' notes')
+    for problem in problems:
+        print('    ' + problem)
+    if len(problems) > 0:
+        raise RuntimeError('Found ' + str(len(problems)) + ' problems with the config changelogs')
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,263 @@
+import argparse
+import concurrent.futures
+import json
+import os
+import shutil
+import tempfile
+import time
+import zlib
+
+import anvil
+import nbt
+import world
+
+PACK_FILENAME = 'region.gobbopack'
+PACK_VERSION = 1
+SYNTHESIZE_STAMP_FILENAME = '.gobbomon_synthesize.json'
+
+# Root tags that differ between chunks that are otherwise identical, like the chunks of a superflat world
+VARIABLE_TAGS = ('xPos', 'zPos', 'LastUpdate')
+DEFAULT_COMPRESSION_LEVEL = 6
+
+
+def get_template_parts(template):
+
+    # Split the chunk around its variable tags, so chunks are built by joining the parts with their values
+    parts = []
+    last_offset = 0
+    offsets = nbt.find_values(template, VARIABLE_TAGS)
+    for name, (tag_type, start, end) in sorted(offsets.items(), key=lambda item: item[1][1]):
+        if tag_type not in nbt.SCALAR_FORMATS:
+            continue
+        parts.append(template[last_offset:start])
+        parts.append((tag_type, VARIABLE_TAGS.index(name)))
+        last_offset = end
+    parts.append(template[last_offset:])
+    return parts
+
+
+def build_chunk(template_parts, values):
+    return b''.join(part if isinstance(part, bytes) else nbt.SCALAR_FORMATS[part[0]].pack(values[part[1]]) for part in template_parts)
+
+
+def split_chunk(chunk_data):
+
+    # Zero the variable tags to get the chunk's template, keeping their values to put back
+    parts = get_template_parts(chunk_data)
+    values = [0] * len(VARIABLE_TAGS)
+    offset = 0
+    for part in parts:
+        if isinstance(part, bytes):
+            offset += len(part)
+        else:
+            values[part[1]] = nbt.SCALAR_FORMATS[part[0]].unpack_from(chunk_data, offset)[0]
+            offset += nbt.SCALAR_FORMATS[part[0]].size
+    return build_chunk(parts, [0] * len(VARIABLE_TAGS)), values
+
+
+def is_packable(filepath):
+
+    # Leave region files with oversized chunks as they are
+    with anvil.RegionFile(filepath) as region_file:
+        return not any(region_file.is_external(x, z) for x, z in region_file.chunks())
+
+
+def pack_regions(region_directory):
+
+    # Store every chunk as the index of its template and the values of its variable tags
+    templates = []
+    template_indexes = {}
+    regions = {}
+    for filepath in anvil.find_region_files(region_directory):
+        if os.path.dirname(filepath) != region_directory or not is_packable(filepath):
+            continue
+        with anvil.RegionFile(filepath) as region_file:
+            indexes = nbt.array.array('i')
+            template_numbers = nbt.array.array('i')
+            timestamps = nbt.array.array('q')
+            values = nbt.array.array('q')
+            for x, z in region_file.chunks():
+                template, chunk_values = split_chunk(region_file.read_chunk(x, z))
+                if template not in template_indexes:
+                    template_indexes[template] = len(templates)
+                    templates.append(template)
+                indexes.append(anvil.get_chunk_index(x, z))
+                template_numbers.append(template_indexes[template])
+                timestamps.append(region_file.get_timestamp(x, z))
+                values.extend(chunk_values)
+        regions[os.path.basename(filepath)] = nbt.Tag(nbt.TAG_COMPOUND, {
+            'Indexes': nbt.Tag(nbt.TAG_INT_ARRAY, indexes),
+            'Templates': nbt.Tag(nbt.TAG_INT_ARRAY, template_numbers),
+            'Timestamps': nbt.Tag(nbt.TAG_LONG_ARRAY, timestamps),
+            'Values': nbt.Tag(nbt.TAG_LONG_ARRAY, values)})
+
+    return nbt.Tag(nbt.TAG_COMPOUND, {
+        'Version': nbt.Tag(nbt.TAG_INT, PACK_VERSION),
+        'VariableTags': nbt.Tag(nbt.TAG_LIST, [nbt.Tag(nbt.TAG_STRING, name) for name in VARIABLE_TAGS], nbt.TAG_STRING),
+        'Templates': nbt.Tag(nbt.TAG_LIST, [nbt.Tag(nbt.TAG_BYTE_ARRAY, nbt.array.array('b', template)) for template in templates], nbt.TAG_BYTE_ARRAY),
+        'Regions': nbt.Tag(nbt.TAG_COMPOUND, regions)})
+
+
+def read_pack(filepath):
+
+    # Check the pack was written by this version and stores the same variable tags
+    pack = nbt.read_tag(nbt.read_file(filepath)[0])[1]
+    if pack['Version'].value != PACK_VERSION or [tag.value for tag in pack['VariableTags'].value] != list(VARIABLE_TAGS):
+        raise RuntimeError('Chunk pack \"' + filepath + '\" was written by an unsupported version')
+    return pack
+
+
+def get_templates(pack):
+    return [get_template_parts(template.value.tobytes()) for template in pack['Templates'].value]
+
+
+def synthesize_region_file(templates, region, destination, compression_level=DEFAULT_COMPRESSION_LEVEL):
+
+    # Write a region without chunks as an empty file, like Minecraft does
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    if len(region['Indexes'].value) == 0:
+        open(destination, 'wb').close()
+        return destination
+
+    # Rebuild and compress every chunk from its template
+    chunks = []
+    value_count = len(VARIABLE_TAGS)
+    for number, index in enumerate(region['Indexes'].value):
+        chunk_values = region['Values'].value[number * value_count:(number + 1) * value_count]
+        data = zlib.compress(build_chunk(templates[region['Templates'].value[number]], chunk_values), compression_level)
+        chunk_bytes = (len(data) + 1).to_bytes(4, 'big') + bytes([anvil.COMPRESSION_ZLIB]) + data
+        chunks.append((index % anvil.REGION_WIDTH, index // anvil.REGION_WIDTH, region['Timestamps'].value[number], chunk_bytes))
+    world.write_chunks(destination, chunks)
+    return destination
+
+
+def verify_region_files(source, destination):
+
+    # Check both region files decode to exactly the same chunks with the same timestamps
+    with anvil.RegionFile(source) as source_region_file, anvil.RegionFile(destination) as region_file:
+        if sorted(region_file.chunks()) != sorted(source_region_file.chunks()):
+            raise RuntimeError('Synthesized region file \"' + destination + '\" has different chunks than \"' + source + '\"')
+        for x, z in source_region_file.chunks():
+            if region_file.read_chunk(x, z) != source_region_file.read_chunk(x, z) or region_file.get_timestamp(x, z) != source_region_file.get_timestamp(x, z):
+                raise RuntimeError('Chunk ' + str(x) + ', ' + str(z) + ' of synthesized region file \"' + destination + '\" doesn\'t match \"' + source + '\"')
+
+
+def find_packs(world_directory):
+
+    # Find the chunk pack of every dimension
+    packs = []
+    for root, dirs, filenames in os.walk(world_directory):
+        dirs.sort()
+        if PACK_FILENAME in filenames:
+            packs.append(os.path.join(root, PACK_FILENAME))
+    return packs
+
+
+def synthesize_world(world_directory, output_directory, compression_level=DEFAULT_COMPRESSION_LEVEL, workers=None):
+
+    # Reuse the last synthesized region files if none of the packs have changed
+    packs = find_packs(world_directory)
+    stamp = {'Compression Level': compression_level, 'Packs': {
+        os.path.relpath(filepath, world_directory): [os.stat(filepath).st_size, os.stat(filepath).st_mtime_ns] for filepath in packs}}
+    stamp_filepath = os.path.join(output_directory, SYNTHESIZE_STAMP_FILENAME)
+    try:
+        with open(stamp_filepath, 'r') as data:
+            last_stamp = json.load(data)
+        if last_stamp['Stamp'] == json.loads(json.dumps(stamp)):
+            return last_stamp['Results'], False
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+        pass
+    if os.path.exists(output_directory):
+        shutil.rmtree(output_directory)
+
+    # Rebuild the region files of every pack in parallel, each result maps a region file to the pack it came from
+    results = {}
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = {}
+        for filepath in packs:
+            pack = read_pack(filepath)
+            templates = get_templates(pack)
+            region_directory = os.path.join(os.path.dirname(os.path.relpath(filepath, world_directory)), world.CHUNK_DIRECTORY)
+            for filename, region in pack['Regions'].value.items():
+                relative_path = os.path.join(region_directory, filename)
+                results[relative_path] = os.path.relpath(filepath, world_directory)
+                futures[relative_path] = executor.submit(
+                    synthesize_region_file, templates, region, os.path.join(output_directory, relative_path), compression_level)
+        for future in futures.values():
+            future.result()
+
+    # Remember the synthesized region files for the next build
+    os.makedirs(output_directory, exist_ok=True)
+    with open(stamp_filepath, 'w') as data:
+        data.write(json.dumps({'Stamp': stamp, 'Results': results}))
+
+    return results, True
+
+
+def pack_world(world_directory, remove_sources=False, compression_level=DEFAULT_COMPRESSION_LEVEL):
+
+    results = []
+    for dimension_directory in world.find_dimension_directories(world_directory):
+        region_directory = os.path.join(dimension_directory, world.CHUNK_DIRECTORY)
+        pack = pack_regions(region_directory)
+        pack_filepath = os.path.join(dimension_directory, PACK_FILENAME)
+        source_filepaths = [os.path.join(region_directory, filename) for filename in pack['Regions'].value]
+        source_size = sum(os.path.getsize(filepath) for filepath in source_filepaths)
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            # Write the pack and time rebuilding every region file from it
+            temporary_pack_filepath = os.path.join(directory, PACK_FILENAME)
+            nbt.write_file(temporary_pack_filepath, nbt.write_tag('', pack))
+            start = time.perf_counter()
+            templates = get_templates(read_pack(temporary_pack_filepath))
+            for filename, region in pack['Regions'].value.items():
+                synthesize_region_file(templates, region, os.path.join(directory, world.CHUNK_DIRECTORY, filename), compression_level)
+            synthesize_time = time.perf_counter() - start
+
+            # Only keep the pack once every rebuilt region file decodes to the same chunks as the original
+            for filepath in source_filepaths:
+                verify_region_files(filepath, os.path.join(directory, world.CHUNK_DIRECTORY, os.path.basename(filepath)))
+            pack_size = os.path.getsize(temporary_pack_filepath)
+            if remove_sources:
+                shutil.move(temporary_pack_filepath, pack_filepath)
+                for filepath in source_filepaths:
+                    os.remove(filepath)
+
+        results.append((os.path.relpath(region_directory, world_directory), len(source_filepaths), len(pack['Templates'].value),
+                        sum(len(region['Indexes'].value) for region in pack['Regions'].value.values()), source_size, pack_size, synthesize_time))
+
+    return results
+
+
+def unpack_world(world_directory, compression_level=DEFAULT_COMPRESSION_LEVEL):
+
+    # Write the region files back next to each pack and remove the pack
+    for filepath in find_packs(world_directory):
+        pack = read_pack(filepath)
+        templates = get_templates(pack)
+        for filename, region in pack['Regions'].value.items():
+            synthesize_region_file(templates, region, os.path.join(os.path.dirname(filepath), world.CHUNK_DIRECTORY, filename), compression_level)
+        os.remove(filepath)
+
+
+def run():
+
+    parser = argparse.ArgumentParser(description='Store the chunk regions of a world as chunk templates, or write them back')
+    parser.add_argument('action', choices=('check', 'pack', 'unpack'), help='report the savings, replace the region files with packs or write them back')
+    parser.add_argument('world', help='world folder')
+    parser.add_argument('--level', type=int, choices=range(1, 10), default=DEFAULT_COMPRESSION_LEVEL, help='zlib level of the rebuilt chunks')
+    arguments = parser.parse_args()
+
+    if arguments.action == 'unpack':
+        unpack_world(arguments.world, arguments.level)
+        return
+
+    # Report how much smaller each pack is than the region files it replaces and how long they take to rebuild
+    for name, region_count, template_count, chunk_count, source_size, pack_size, synthesize_time in pack_world(arguments.world, arguments.action == 'pack', arguments.level):
+        print(name + ': ' + str(chunk_count) + ' chunks in ' + str(region_count) + ' region files share ' + str(template_count) + ' templates, '
+              + format(source_size / 1e6, '.1f') + ' MB -> ' + format(pack_size / 1e6, '.2f') + ' MB, rebuilt in ' + format(synthesize_time, '.2f') + ' s')
+
+
+if __name__ == '__main__':
+    run()
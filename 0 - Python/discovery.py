@@ -0,0 +1,146 @@
+import os
+import queue
+import string
+import sys
+import threading
+
+ATLAUNCHER_FILENAMES = ('ATLauncher.exe', 'ATLauncher.jar')
+DEFAULT_SEARCH_DEPTH = 8
+DEFAULT_SEARCH_WORKERS = 8
+
+# Directories that never contain an ATLauncher install and are expensive to walk
+PRUNED_DIRECTORY_NAMES = {
+    '$recycle.bin',
+    '$windows.~bt',
+    '$windows.~ws',
+    '.cache',
+    '.git',
+    '.gradle',
+    '.m2',
+    '.svn',
+    '__pycache__',
+    'node_modules',
+    'system volume information',
+    'windows',
+    'windowsapps',
+    'winsxs'}
+
+# Virtual filesystems that are never worth walking
+PRUNED_DIRECTORY_PATHS = {'/dev', '/proc', '/run', '/sys'}
+
+
+def is_atlauncher_directory(directory):
+    return any(os.path.isfile(os.path.join(directory, filename)) for filename in ATLAUNCHER_FILENAMES)
+
+
+def get_well_known_directories():
+
+    directories = []
+    home_directory = os.path.expanduser('~')
+
+    if sys.platform == 'win32':
+
+        # Check the installer and portable install locations
+        for variable in ('ProgramFiles', 'ProgramFiles(x86)', 'LOCALAPPDATA', 'APPDATA', 'USERPROFILE'):
+            if os.environ.get(variable):
+                directories.append(os.path.join(os.environ[variable], 'ATLauncher'))
+        if os.environ.get('LOCALAPPDATA'):
+            directories.append(os.path.join(os.environ['LOCALAPPDATA'], 'Programs', 'ATLauncher'))
+        directories.append(os.path.join(home_directory, 'Desktop', 'ATLauncher'))
+        directories.append(os.path.join(home_directory, 'Downloads', 'ATLauncher'))
+        directories.extend(drive + 'ATLauncher' for drive in get_search_roots())
+    else:
+
+        # Check the XDG data directories, including the Flatpak data directory
+        data_directories = [os.environ.get('XDG_DATA_HOME') or os.path.join(home_directory, '.local', 'share')]
+        data_directories.extend((os.environ.get('XDG_DATA_DIRS') or '/usr/local/share:/usr/share').split(os.pathsep))
+        data_directories.append(os.path.join(home_directory, '.var', 'app', 'com.atlauncher.ATLauncher', 'data'))
+        directories.extend(os.path.join(directory, 'ATLauncher') for directory in data_directories if directory)
+        directories.append(os.path.join(home_directory, 'Library', 'Application Support', 'ATLauncher'))
+        directories.append(os.path.join(home_directory, 'ATLauncher'))
+        directories.append('/opt/ATLauncher')
+
+    return list(dict.fromkeys(directories))
+
+
+def get_search_roots():
+    if sys.platform == 'win32':
+        return [letter + ':\\' for letter in string.ascii_uppercase if os.path.isdir(letter + ':\\')]
+    return [os.path.expanduser('~'), os.path.abspath(os.sep)]
+
+
+def search_directories(roots, max_depth=DEFAULT_SEARCH_DEPTH, workers=DEFAULT_SEARCH_WORKERS):
+
+    pending_directories = queue.Queue()
+    found_directories = queue.Queue()
+    stop_event = threading.Event()
+    root_directories = {os.path.normcase(os.path.abspath(root)) for root in roots}
+
+    def search():
+        while (pending_directory := pending_directories.get()) is not None:
+            directory, depth = pending_directory
+            try:
+
+                # Drain the remaining directories without scanning them once the search has stopped
+                if stop_event.is_set():
+                    continue
+
+                found = False
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+
+                            # Skip irrelevant directories and directories that are searched from their own root
+                            if depth >= max_depth or entry.name.lower() in PRUNED_DIRECTORY_NAMES or entry.path in PRUNED_DIRECTORY_PATHS:
+                                continue
+                            if os.path.normcase(entry.path) in root_directories:
+                                continue
+                            pending_directories.put((entry.path, depth + 1))
+                        elif entry.name in ATLAUNCHER_FILENAMES:
+                            found = True
+                if found:
+                    found_directories.put(directory)
+            except OSError:
+                pass
+            finally:
+                pending_directories.task_done()
+
+    def finish():
+
+        # Release the workers once every directory has been searched or drained
+        pending_directories.join()
+        for _ in search_threads:
+            pending_directories.put(None)
+        found_directories.put(None)
+
+    # Walk the directory trees breadth first on a pool of worker threads
+    for root in roots:
+        pending_directories.put((root, 0))
+    search_threads = [threading.Thread(target=search, daemon=True) for _ in range(max(1, workers))]
+    finish_thread = threading.Thread(target=finish, daemon=True)
+    for thread in search_threads + [finish_thread]:
+        thread.start()
+
+    # Yield each install as soon as it is found, stopping the workers and waiting for them to exit when the caller stops iterating
+    try:
+        while (directory := found_directories.get()) is not None:
+            yield directory
+    finally:
+        stop_event.set()
+        for thread in search_threads + [finish_thread]:
+            thread.join()
+
+
+def find_atlauncher_directories():
+
+    found_directories = set()
+
+    # Check the well known install locations first, then search the drives
+    for directory in get_well_known_directories():
+        if is_atlauncher_directory(directory):
+            found_directories.add(os.path.normcase(os.path.abspath(directory)))
+            yield directory
+    for directory in search_directories(get_search_roots()):
+        if os.path.normcase(os.path.abspath(directory)) not in found_directories:
+            found_directories.add(os.path.normcase(os.path.abspath(directory)))
+            yield directory
@@ -1,17 +1,53 @@
+import concurrent.futures
 import json
 import os
-import shutil
-import string
-
-ATLAUNCHER_FILENAME = 'ATLauncher.exe'
+import threading
+import time
+
+import blobstore
+import catalog
+import changelog
+import chunkpack
+import discovery
+import ignore
+import lfs
+import manifest
+import materialize
+import planner
+import stages
+import target
+import world
+
+INSTANCE_SIDES = {'instances': 'Client', 'servers': 'Server'}
+STAGING_DIRECTORY_NAME = '.gobbomon_staging'
+BLOB_STORE_DIRECTORY_NAME = '.gobbomon_store'
+HASH_CACHE_FILENAME = '.gobbomon_hashes.json'
+METADATA_CACHE_FILENAME = '.gobbomon_cache.json'
+PATCHED_CONFIG_DIRECTORY_NAME = '.gobbomon_patched'
+REWRITTEN_WORLD_DIRECTORY_NAME = '.gobbomon_worlds'
+SANITIZED_WORLD_DIRECTORY_NAME = '.gobbomon_sanitized'
+SYNTHESIZED_WORLD_DIRECTORY_NAME = '.gobbomon_synthesized'
+
+log_lock = threading.Lock()
+
+
+def log(level, data):
+
+    # Prefix messages logged from a build stage with the stage name and keep lines from concurrent stages whole
+    stage = stages.get_current_stage()
+    with log_lock:
+        if stage is None:
+            print(level, data)
+        else:
+            print(level, '[' + stage + ']', data)
 
 
 def log_info(info_data):
-    print('[INFO]', info_data)
+    log('[INFO]', info_data)
 
 
 def log_warning(warning_data):
-    print('[WARNING]', warning_data)
+    log('[WARNING]', warning_data)
 
 
 def get_project_directory():
@@ -37,164 +73,418 @@ def locate_atlauncher_directory():
             log_warning('ATLauncher install directory data contains an invalid datatype')
         elif len(directory) == 0:
             log_warning('ATLauncher install directory data doesn\'t contain a valid directory')
-        elif not os.path.isfile(os.path.join(directory, ATLAUNCHER_FILENAME)):
+        elif not discovery.is_atlauncher_directory(directory):
             log_warning('ATLauncher install directory data doesn\'t contain a valid file')
         else:
             return directory
 
     log_info('Searching for ATLauncher install directory...')
-    for letter in string.ascii_uppercase:
-        for root, dirs, files in os.walk(letter + ':\\'):
-            if ATLAUNCHER_FILENAME in files:
-                log_info('Found ATLauncher install at the following location: ' + root)
-                while True:
-                    match input('Would you like to use this as your ATLauncher install directory? (y/n) '):
-                        case 'y' | 'Y':
-                            with open(data_filepath, "w") as data:
-                                data.write(json.dumps({'Install Directory': root}, indent=4))
-                            log_info('Stored ATLauncher install directory in data file')
-                            return root
-                        case 'n' | 'N':
-                            break
-                        case _:
-                            print('INVALID RESPONSE')
+    for root in discovery.find_atlauncher_directories():
+        log_info('Found ATLauncher install at the following location: ' + root)
+        while True:
+            match input('Would you like to use this as your ATLauncher install directory? (y/n) '):
+                case 'y' | 'Y':
+                    settings = load_settings()
+                    settings['Install Directory'] = root
+                    with open(data_filepath, "w") as data:
+                        data.write(json.dumps(settings, indent=4))
+                    log_info('Stored ATLauncher install directory in data file')
+                    return root
+                case 'n' | 'N':
+                    break
+                case _:
+                    print('INVALID RESPONSE')
     raise RuntimeError('Unable to load ATLauncher install directory')
 
 
-def remove_changelog(directory, sub_directory):
+def load_settings():
+
+    # Treat a missing or unreadable data file as having no settings
+    try:
+        with open(os.path.join(os.path.dirname(__file__), 'data.json'), 'r') as data:
+            settings = json.load(data)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    return settings if isinstance(settings, dict) else {}
+
+
+def get_setting(setting_name, default_value):
+    return load_settings().get(setting_name, default_value)
+
+
+def get_materialization_strategy():
+
+    # Fall back to copying files if the data file contains an unknown strategy
+    strategy = get_setting('Materialization Strategy', 'copy')
+    if strategy not in materialize.STRATEGIES:
+        log_warning('Unknown materialization strategy \"' + str(strategy) + '\", copying files instead')
+        return 'copy'
+    return strategy
+
+
+def get_file_hasher():
+    return manifest.FileHasher(os.path.join(os.path.dirname(__file__), HASH_CACHE_FILENAME))
+
+
+def get_blob_store(atlauncher_directory):
 
-    # Remove a changelog file if one exists
-    changelog_filepath = os.path.join(directory, sub_directory, '_changelog.txt')
-    if os.path.isfile(changelog_filepath):
-        os.remove(changelog_filepath)
+    # Only share files between builds through the blob store when it is turned on
+    if not get_setting('Blob Store', False):
+        return None
+    return blobstore.BlobStore(get_setting('Blob Store Directory', os.path.join(atlauncher_directory, BLOB_STORE_DIRECTORY_NAME)))
 
 
-def generate_instance_directory(instance_type):
+def generate_instance_directory(instance_type, atlauncher_directory=None, hasher=None):
 
     # Get the ATLauncher install directory
-    atlauncher_directory = locate_atlauncher_directory()
-    log_info('ATLauncher install directory: ' + atlauncher_directory)
+    if atlauncher_directory is None:
+        atlauncher_directory = locate_atlauncher_directory()
+        log_info('ATLauncher install directory: ' + atlauncher_directory)
 
-    # Get the instance directory
+    # Get the instance directory and the directory it is built in before replacing it
     instance_directory = str(os.path.join(atlauncher_directory, instance_type, os.path.basename(get_project_directory())))
+    staging_directory = str(os.path.join(atlauncher_directory, STAGING_DIRECTORY_NAME, instance_type, os.path.basename(get_project_directory())))
+    instance = target.BuildTarget(
+        instance_directory,
+        staging_directory,
+        get_materialization_strategy(),
+        get_setting('Copy Workers', materialize.DEFAULT_WORKERS),
+        hasher if hasher is not None else get_file_hasher(),
+        INSTANCE_SIDES[instance_type],
+        get_blob_store(atlauncher_directory))
+
+    # Reuse the files of an existing instance directory if it can be rebuilt incrementally from the last build manifest
+    if os.path.exists(instance_directory) and get_setting('Incremental Build', False) and instance.load_manifest():
+        log_info('Rebuilding existing ' + instance_type + ' directory incrementally')
+    log_info('ATLauncher ' + instance_type + ' directory: ' + instance_directory)
 
-    # Remove an existing instance directory if one exist
-    if os.path.exists(instance_directory):
-        shutil.rmtree(instance_directory)
-        log_info('Removed existing ' + instance_type + ' directory')
+    return instance
 
-    # Make a new instance directory
-    os.makedirs(instance_directory)
-    log_info('ATLauncher ' + instance_type + ' directory: ' + instance_directory)
 
-    return instance_directory
+def write_stage(instance, files, cancel_event):
 
+    # Write the stage's files to the instance directory
+    copied_files, skipped_files = instance.write_files(files, cancel_event)
+    log_info('Copied ' + str(copied_files) + ' files and skipped ' + str(skipped_files) + ' unchanged files')
+    return copied_files, skipped_files
 
-def add_core_files(instance_directory, core_type):
 
-    # Copy core files to instance directory
-    shutil.copytree(
-        os.path.join(get_project_directory(), str(core_type)),
-        instance_directory,
-        dirs_exist_ok=True)
+def add_config_files(instance):
+
+    # Merge the config layers, warning about every config file written by more than one layer
+    collisions = instance.add_config_files('Config Files')
+    for relative_path, names in sorted(collisions.items()):
+        log_warning('Config file \"' + relative_path + '\" is written by ' + ', '.join('\"' + name + '\"' for name in names)
+                    + ', using \"' + names[-1] + '\"')
+
+    # Log the config files left out because only the other side reads them
+    pruned_files = instance.config_overlay.pruned_files
+    if len(pruned_files) > 0:
+        pruned_size = sum(os.path.getsize(source) for source, relative_path in pruned_files)
+        log_info('Left out ' + str(len(pruned_files)) + ' config files (' + format(pruned_size / 1024, '.0f') + ' KB) not used by the '
+                 + instance.side.lower())
+
+
+def find_world_paths(instance):
+
+    # Find every world in the saves folder of the instance from its level.dat
+    return sorted(os.path.dirname(path) for path in instance.files if path.split(os.sep)[0] == 'saves' and path.count(os.sep) == 2 and os.path.basename(path) == 'level.dat')
+
+
+def sanitize_worlds(instance):
+
+    # Only ship the worlds as they were last played when sanitizing them is turned off
+    if not get_setting('Sanitize Worlds', True):
+        return
+
+    for world_path in find_world_paths(instance):
+
+        # Leave out the files holding the player's inventory, stats, advancements, per-player mod data and session
+        removed_paths = [path for path in instance.files if path.startswith(os.path.join(world_path, '')) and world.is_player_file(os.path.relpath(path, world_path))]
+        removed_size = sum(os.path.getsize(instance.files[path][1]) for path in removed_paths)
+        for path in removed_paths:
+            instance.remove_file(path)
+
+        # Build the level.dat without the player once, only writing it again when the shipped level.dat changes
+        level_path = os.path.join(world_path, 'level.dat')
+        sanitized_filepath = os.path.join(os.path.dirname(__file__), SANITIZED_WORLD_DIRECTORY_NAME, instance.side, os.path.basename(world_path), 'level.dat')
+        world.sanitize_level(instance.files[level_path][1], sanitized_filepath)
+        instance.replace_source(level_path, sanitized_filepath)
+        log_info('Sanitized world \"' + os.path.basename(world_path) + '\": left out ' + str(len(removed_paths)) + ' player files ('
+                 + format(removed_size / 1024, '.0f') + ' KB) and reset the player in level.dat')
+
+
+def get_compression_level():
+    return get_setting('Recompression Level', None)
+
+
+def synthesize_worlds(instance):
+
+    for world_path in find_world_paths(instance):
+        pack_paths = [path for path in instance.files if path.startswith(os.path.join(world_path, '')) and os.path.basename(path) == chunkpack.PACK_FILENAME]
+        if len(pack_paths) == 0:
+            continue
+
+        # Rebuild the chunk regions the world stores as chunk packs, only rebuilding them again when a pack changes
+        start = time.perf_counter()
+        world_directory = os.path.dirname(instance.files[os.path.join(world_path, 'level.dat')][1])
+        output_directory = os.path.join(os.path.dirname(__file__), SYNTHESIZED_WORLD_DIRECTORY_NAME, instance.side, os.path.basename(world_path))
+        compression_level = get_compression_level()
+        results, synthesized = chunkpack.synthesize_world(
+            world_directory, output_directory, compression_level if compression_level is not None else chunkpack.DEFAULT_COMPRESSION_LEVEL)
+
+        # Ship the rebuilt region files in place of the packs
+        for relative_path, pack_path in sorted(results.items()):
+            instance.add_file(instance.files[os.path.join(world_path, pack_path)][0], os.path.join(output_directory, relative_path), os.path.join(world_path, relative_path))
+        for path in pack_paths:
+            instance.remove_file(path)
+        log_info(('Synthesized' if synthesized else 'Reused synthesized') + ' ' + str(len(results)) + ' region files of world \"'
+                 + os.path.basename(world_path) + '\" from ' + str(len(pack_paths)) + ' chunk packs in ' + format(time.perf_counter() - start, '.2f') + ' s')
+
+
+def rewrite_worlds(instance):
+
+    # Only rewrite the shipped worlds when trimming or compacting them is enabled
+    trim_settings = None
+    if get_setting('Trim Worlds', False):
+        trim_settings = (get_setting('Trim Inhabited Time', 1), get_setting('Trim Spawn Radius', 8))
+    compression_level = get_compression_level()
+    if trim_settings is None and not get_setting('Compact Worlds', False):
+        return
+
+    # Replace the region files of every world in the instance with rewritten copies
+    for world_path in find_world_paths(instance):
+        world_directory = os.path.dirname(instance.files[os.path.join(world_path, 'level.dat')][1])
+
+        # Synthesized chunk regions are already packed, and trimming the rest of the world without them would drop its entities
+        if len(chunkpack.find_packs(world_directory)) > 0:
+            log_warning('Not rewriting world \"' + os.path.basename(world_path) + '\", its chunk regions are synthesized from chunk packs')
+            continue
+        output_directory = os.path.join(os.path.dirname(__file__), REWRITTEN_WORLD_DIRECTORY_NAME, instance.side, os.path.basename(world_path))
+        results, rewritten = world.rewrite_world(world_directory, output_directory, trim_settings, compression_level)
+        for relative_path, (output, source_size, output_size) in sorted(results.items()):
+            if os.path.join(world_path, relative_path) not in instance.files:
+                continue
+            if output is None:
+                instance.remove_file(os.path.join(world_path, relative_path))
+            else:
+                instance.replace_source(os.path.join(world_path, relative_path), output)
+            if rewritten and source_size != output_size:
+                log_info('Rewrote region file \"' + relative_path + '\": ' + format((output_size - source_size) / 1024, '+.0f') + ' KB')
+
+        kept_files = len([result for result in results.values() if result[0] is not None])
+        saved_size = sum(source_size - output_size for output, source_size, output_size in results.values())
+        log_info(('Rewrote' if rewritten else 'Reused rewritten') + ' world \"' + os.path.basename(world_path) + '\": kept ' + str(kept_files) + ' of '
+                 + str(len(results)) + ' region files, ' + format(saved_size / 1e6, '.1f') + ' MB saved')
+
+
+def resolve_lfs_pointers(instances):
+
+    # Leave every file as it is when the checkout is known to hold the real files
+    if not get_setting('Resolve LFS Pointers', True):
+        return
+
+    # Find and verify the object of every Git LFS pointer the instances would copy
+    object_directories = lfs.get_object_directories(get_project_directory(), get_setting('LFS Mirror Directory', None))
+    sources = [source for instance in instances for stage, source in instance.files.values()]
+    resolved, unresolved = lfs.resolve_pointers(sources, object_directories, instances[0].manifest.hasher, get_setting('Copy Workers', materialize.DEFAULT_WORKERS))
+
+    # Raise error listing every pointer that couldn't be resolved before anything is written
+    if len(unresolved) > 0:
+        raise RuntimeError('Unable to resolve ' + str(len(unresolved)) + ' Git LFS pointers, fetch them with \"git lfs pull\" or set \"LFS Mirror Directory\":\n'
+                           + '\n'.join(os.path.relpath(source, get_project_directory()) + ': ' + error for source, error in sorted(unresolved.items())))
+
+    # Copy each object in place of its pointer
+    for instance in instances:
+        for relative_path, (stage, source) in list(instance.files.items()):
+            if source in resolved:
+                instance.replace_source(relative_path, resolved[source])
+    if len(resolved) > 0:
+        log_info('Resolved ' + str(len(resolved)) + ' Git LFS pointers')
+
+
+def write_instances(instances):
+
+    # Synthesize, rewrite and sanitize the worlds and merge the config files of each instance
+    for instance in instances:
+        synthesize_worlds(instance)
+        rewrite_worlds(instance)
+        sanitize_worlds(instance)
+        add_config_files(instance)
+    resolve_lfs_pointers(instances)
+
+    # Build each instance in its staging directory, leaving the existing instance directories untouched until every build succeeds
+    try:
+        for instance in instances:
+            instance.prepare()
+
+        # Write each stage's files, running stages that don't write to overlapping paths concurrently
+        build_stages = []
+        for instance in instances:
+            for stage, files in instance.get_stage_files().items():
+
+                # Name the stages after their side when several instances are written together
+                stage_name = stage if len(instances) == 1 else instance.side + ' ' + stage
+                outputs = [os.path.join(instance.staging_directory, output) for output in sorted(instance.stage_outputs[stage])]
+                build_stages.append(stages.Stage(stage_name, outputs, write_stage, instance, files))
+
+        # Share one pool of copy workers between every stage so concurrent stages don't write more files at once than it allows
+        with concurrent.futures.ThreadPoolExecutor(max(1, instances[0].workers)) as executor:
+            for instance in instances:
+                instance.executor = executor
+            try:
+                stages.run_stages(build_stages)
+            finally:
+                for instance in instances:
+                    instance.executor = None
+
+        # Remove files that are no longer wanted
+        removed_files = [instance.remove_unwanted_files() for instance in instances]
+    except BaseException:
+        for instance in instances:
+            instance.discard()
+        log_warning('Build failed, existing directories have been left unchanged')
+        raise
+
+    # Replace the existing instance directories
+    for instance, instance_removed_files in zip(instances, removed_files):
+        instance_type = os.path.basename(os.path.dirname(instance.directory))
+        if instance.commit():
+            log_info('Replaced existing ' + instance_type + ' directory')
+
+        log_info('Wrote ' + instance_type + ' directory: ' + str(instance.copied_files) + ' files copied, '
+                 + str(instance.skipped_files) + ' unchanged files skipped and ' + str(instance_removed_files) + ' files removed')
+        for strategy, file_count in sorted(instance.strategy_counts.items()):
+            log_info('Materialized ' + str(file_count) + ' files using ' + strategy)
+        if instance.blob_store is not None:
+            log_info('Blob store: ' + instance.blob_store.directory)
+
+    # Remember the hash of every file so unchanged files aren't hashed again by the next build
+    for hasher in {instance.manifest.hasher for instance in instances}:
+        hasher.save()
+
+
+def write_instance(instance):
+    write_instances([instance])
+
+
+def add_core_files(instance, core_type):
+
+    # Add core files to instance as the first config layer
+    core_directory = os.path.join(get_project_directory(), str(core_type))
+    patched_files, stale_changes = get_patched_config_files(core_directory, str(core_type))
+    check_stale_changes(stale_changes)
+    core_files = target.list_tree(core_directory, matchers=get_ignore_matchers(core_directory))
+    instance.add_layer('Core Files', str(core_type), core_files + patched_files)
     log_info('Added core files')
 
-    # Remove instance core config changelog file from new instance
-    remove_changelog(instance_directory, 'config')
-    remove_changelog(instance_directory, 'defaultconfigs')
 
+def get_ignore_matchers(directory):
+    return ignore.load_matchers(get_project_directory(), directory)
+
+
+def get_patched_config_files(directory, name):
+
+    # Rebuild the configs only stored as changelogs by patching the upstream defaults, if there are any
+    default_directory = get_setting('Default Config Directory', None)
+    if default_directory is None:
+        return [], []
+    return changelog.patch_configs(directory, default_directory, os.path.join(os.path.dirname(__file__), PATCHED_CONFIG_DIRECTORY_NAME, name))
 
-def get_mod_directory(f_mod_name, f_project_directory):
 
-    # Check if the mod exists in the content mods directory
-    for mod in os.scandir(os.path.join(f_project_directory, '3 - Content Mods', 'Enabled')):
-        if mod.is_dir() and mod.name == f_mod_name:
-            return mod.path
+def check_stale_changes(stale_changes):
 
-    # Check if the mod exists in the dependency mods directory
-    for mod in os.scandir(os.path.join(f_project_directory, '4 - Dependency Mods')):
-        if mod.is_dir() and mod.name == f_mod_name:
-            return mod.path
+    # Raise error listing every change that no longer applies to the upstream defaults
+    if len(stale_changes) > 0:
+        for change in stale_changes:
+            log_warning('Stale config change: ' + change.describe())
+        raise RuntimeError('Found ' + str(len(stale_changes)) + ' config changes that no longer apply to the upstream defaults')
 
-    # Raise error if the mod could not be found
-    raise RuntimeError('Required mod \"' + f_mod_name + '\" is missing from project')
 
+def get_mod_catalog():
 
-def add_mod(f_mod_name, f_enabled_mods, f_target_directory):
+    # Load the mods from the metadata cache, only reading the mods that have changed since the last run
+    mod_directories = [os.path.join(get_project_directory(), catalog.CONTENT_MODS_DIRECTORY), os.path.join(get_project_directory(), catalog.DEPENDENCY_MODS_DIRECTORY)]
+    cache = catalog.MetadataCache(
+        os.path.join(os.path.dirname(__file__), METADATA_CACHE_FILENAME),
+        {'Ignore Files': ignore.stat_ignore_files(get_project_directory(), mod_directories)})
+    cache.load()
+    mod_catalog = catalog.ModCatalog(get_project_directory(), cache)
+    mod_catalog.save_cache()
+    log_info('Loaded ' + str(len(mod_catalog.mods)) + ' mods, ' + str(mod_catalog.changed_mods) + ' changed since the last run')
 
-    added_mods = []
+    return mod_catalog
 
-    # Check if mod has already been added
-    if f_mod_name in f_enabled_mods:
-        return added_mods
 
-    # Get the mod directory and open the mod data file
-    mod_directory = get_mod_directory(f_mod_name, get_project_directory())
-    with open(os.path.join(mod_directory, 'data.json'), 'r') as data:
+def validate_mods(mod_catalog, sides):
 
-        # Load mod data file
-        mod_data = json.load(data)
+    # Raise error listing every problem with the mod dependency graph before anything is built
+    problems = planner.validate_catalog(mod_catalog, sides)
+    if len(problems) > 0:
+        for problem in problems:
+            log_warning(problem)
+        raise RuntimeError('Found ' + str(len(problems)) + ' problems with the project mods')
+    log_info('Validated project mods')
 
-        # Prevent a non client side mod from being added to the client
-        if not mod_data['Client']:
-            if os.path.basename(os.path.dirname(f_target_directory)) == 'instances':
-                return added_mods
 
-        # Prevent a non server side mod from being added to the server
-        if not mod_data['Server']:
-            if os.path.basename(os.path.dirname(f_target_directory)) == 'servers':
-                return added_mods
+def add_mod(mod, build_plan, instance, patched_files=()):
 
-        # Add dependency mods if required
-        for dependency_mod in mod_data['Dependencies']:
-            if dependency_mod not in added_mods:
-                added_mods.extend(add_mod(dependency_mod, f_enabled_mods, f_target_directory))
-                if dependency_mod not in added_mods:
-                    if dependency_mod not in f_enabled_mods:
-                        raise RuntimeError('Required mod \"' + dependency_mod + '\" was unable to be added')
+    # Add all planned mod files, layering the mod's config files over the mods planned before it
+    instance.add_layer('Mods', mod.name, build_plan.files[mod.name] + list(patched_files), mod.file_sides)
+    log_info('Added mod: ' + mod.name)
 
-        # Add all mod files
-        for f in os.scandir(mod_directory):
-            if f.is_dir():
-                if f.name == 'config' or f.name == 'defaultconfigs':
-                    if not os.path.isfile(os.path.join(mod_directory, f.name, '_changelog.txt')):
-                        continue
-                shutil.copytree(
-                    os.path.join(mod_directory, f.name),
-                    os.path.join(f_target_directory, f.name),
-                    dirs_exist_ok=True)
 
-        # Remove config changelog file
-        remove_changelog(f_target_directory, 'config')
-        remove_changelog(f_target_directory, 'defaultconfigs')
+def plan_mods(mod_catalog, instances):
 
-    # Return list of all mods that have been added from this function call and recursive calls
-    log_info('Added mod: ' + f_mod_name)
-    added_mods.append(f_mod_name)
-    return added_mods
+    # Plan the mods of every instance from a single walk of the dependency graph
+    sides = [instance.side for instance in instances]
+    build_plans = planner.create_build_plans(mod_catalog, sides)
+    return [build_plans[side] for side in sides]
 
 
-def add_mods(instance_directory):
-    enabled_mods = []
-    for mod in os.scandir(os.path.join(get_project_directory(), '3 - Content Mods', 'Enabled')):
-        if mod.is_dir():
-            enabled_mods.extend(add_mod(mod.name, enabled_mods, instance_directory))
-    log_info('Total mods added: ' + str(len(enabled_mods)))
+def add_mods(instance, mod_catalog=None, build_plan=None):
 
-    return [mod.name for mod in os.scandir(os.path.join(get_project_directory(), '4 - Dependency Mods')) if mod.is_dir() and mod.name not in enabled_mods]
+    # Scan the project mods once and plan every mod required by this side in dependency order
+    if mod_catalog is None:
+        mod_catalog = get_mod_catalog()
+    if build_plan is None:
+        build_plan = planner.create_build_plan(mod_catalog, instance.side)
 
+    # Patch the configs of every planned mod, checking all of them before any are added
+    patched_files = {}
+    stale_changes = []
+    for mod in build_plan.mods:
+        patched_files[mod.name], mod_stale_changes = get_patched_config_files(mod.directory, mod.name)
+        stale_changes.extend(mod_stale_changes)
+    check_stale_changes(stale_changes)
 
-def add_resource_packs(instance_directory):
-    shutil.copytree(
-        os.path.join(get_project_directory(), '5 - Resource Packs'),
-        os.path.join(instance_directory, 'resourcepacks'),
-        dirs_exist_ok=True)
+    # Add the planned mods
+    for mod in build_plan.mods:
+        add_mod(mod, build_plan, instance, patched_files[mod.name])
+    log_info('Total mods added: ' + str(len(build_plan.mods)))
+
+    return [mod.name for mod in mod_catalog.dependency_mods() if mod.name not in build_plan.files]
+
+
+def add_resource_packs(instance):
+    resource_pack_directory = os.path.join(get_project_directory(), '5 - Resource Packs')
+    instance.add_tree('Resource Packs', resource_pack_directory, 'resourcepacks', get_ignore_matchers(resource_pack_directory))
     log_info('Added resource pack files')
 
 
-def add_shader_packs(instance_directory):
-    shutil.copytree(
-        os.path.join(get_project_directory(), '6 - Shader Packs'),
-        os.path.join(instance_directory, 'shaderpacks'),
-        dirs_exist_ok=True)
+def add_shader_packs(instance):
+
+    # List the shader packs and their options files
+    shader_pack_directory = os.path.join(get_project_directory(), '6 - Shader Packs')
+    shader_pack_files = target.list_tree(shader_pack_directory, 'shaderpacks', get_ignore_matchers(shader_pack_directory))
+
+    # Warn about shader pack option files left behind by a shader pack that is no longer included
+    relative_paths = {relative_path for source, relative_path in shader_pack_files}
+    for relative_path in sorted(relative_paths):
+        if relative_path.endswith('.zip.txt') and relative_path[:-len('.txt')] not in relative_paths:
+            log_warning('Shader pack options file \"' + os.path.basename(relative_path) + '\" doesn\'t belong to an included shader pack')
+
+    # Add shader pack files to instance
+    for source, relative_path in shader_pack_files:
+        instance.add_file('Shader Packs', source, relative_path)
     log_info('Added shader pack files')
@@ -1,2 +1,49 @@
-import generate_instance
-import generate_server
+import functions
+
+
+def run():
+
+    # Log the project directory
+    functions.log_info('Project directory: ' + functions.get_project_directory())
+
+    # Load and validate the project mods for both sides before touching the ATLauncher directory
+    mod_catalog = functions.get_mod_catalog()
+    functions.validate_mods(mod_catalog, ['Client', 'Server'])
+
+    # Get the ATLauncher install directory
+    atlauncher_directory = functions.locate_atlauncher_directory()
+    functions.log_info('ATLauncher install directory: ' + atlauncher_directory)
+
+    # Generate new instance and server directories that share hashes of the files written to both
+    hasher = functions.get_file_hasher()
+    instance = functions.generate_instance_directory('instances', atlauncher_directory, hasher)
+    server = functions.generate_instance_directory('servers', atlauncher_directory, hasher)
+
+    # Add core instance and server files
+    functions.add_core_files(instance, '1 - Instance Core')
+    functions.add_core_files(server, '2 - Server Core')
+
+    # Add mods to the instance and server from a single walk of the project mods
+    instance_plan, server_plan = functions.plan_mods(mod_catalog, [instance, server])
+    unused_instance_mods = functions.add_mods(instance, mod_catalog, instance_plan)
+    unused_server_mods = functions.add_mods(server, mod_catalog, server_plan)
+
+    # Add resource packs and shader packs to instance
+    functions.add_resource_packs(instance)
+    functions.add_shader_packs(instance)
+
+    # Write the instance and server files together
+    functions.write_instances([instance, server])
+
+    # Log the mods that neither the instance nor the server require
+    unused_mods = [mod for mod in unused_instance_mods if mod in unused_server_mods]
+    if len(unused_mods) > 0:
+        print()
+        functions.log_warning('The following dependency mods included in the project are not required')
+        print(unused_mods)
+        print()
+
+
+# Only build from the main process, so the world trimming worker processes can import this script
+if __name__ == '__main__':
+    run()
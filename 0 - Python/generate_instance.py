@@ -6,20 +6,27 @@ def run():
     # Log the project directory
     functions.log_info('Project directory: ' + functions.get_project_directory())
 
+    # Load and validate the project mods before touching the ATLauncher directory
+    mod_catalog = functions.get_mod_catalog()
+    functions.validate_mods(mod_catalog, ['Client'])
+
     # Generate a new instance directory
-    instance_directory = functions.generate_instance_directory('instances')
+    instance = functions.generate_instance_directory('instances')
 
     # Add core instance files
-    functions.add_core_files(instance_directory, '1 - Instance Core')
+    functions.add_core_files(instance, '1 - Instance Core')
 
     # Add mods to instance
-    unused_mods = functions.add_mods(instance_directory)
+    unused_mods = functions.add_mods(instance, mod_catalog)
 
     # Add resource packs to instance
-    functions.add_resource_packs(instance_directory)
+    functions.add_resource_packs(instance)
 
     # Add shader packs to instance
-    functions.add_shader_packs(instance_directory)
+    functions.add_shader_packs(instance)
+
+    # Write the instance files
+    functions.write_instance(instance)
 
     # Log the unused mods
     if len(unused_mods) > 0:
@@ -29,4 +36,6 @@ def run():
         print()
 
 
-run()
+# Only build from the main process, so the world trimming worker processes can import this script
+if __name__ == '__main__':
+    run()
@@ -6,14 +6,21 @@ def run():
     # Log the project directory
     functions.log_info('Project directory: ' + functions.get_project_directory())
 
+    # Load and validate the project mods before touching the ATLauncher directory
+    mod_catalog = functions.get_mod_catalog()
+    functions.validate_mods(mod_catalog, ['Server'])
+
     # Generate a new instance directory
-    instance_directory = functions.generate_instance_directory('servers')
+    instance = functions.generate_instance_directory('servers')
 
     # Add core server files
-    functions.add_core_files(instance_directory, '2 - Server Core')
+    functions.add_core_files(instance, '2 - Server Core')
 
     # Add mods to instance
-    unused_mods = functions.add_mods(instance_directory)
+    unused_mods = functions.add_mods(instance, mod_catalog)
+
+    # Write the instance files
+    functions.write_instance(instance)
 
     # Log the unused mods
     if len(unused_mods) > 0:
@@ -23,4 +30,6 @@ def run():
         print()
 
 
-run()
+# Only build from the main process, so the world trimming worker processes can import this script
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,175 @@
+import argparse
+
+import catalog
+import functions
+import planner
+
+
+def get_mask_indexes(mask):
+
+    # Yield the index of every set bit, lowest first
+    while mask:
+        low_bit = mask & -mask
+        yield low_bit.bit_length() - 1
+        mask ^= low_bit
+
+
+def close_graph(edges, names):
+
+    closures = [0] * len(edges)
+    states = [0] * len(edges)
+
+    for start_index in range(len(edges)):
+        if states[start_index] != 0:
+            continue
+
+        # Walk the graph depth first, closing each node over the closures of the nodes it points to
+        states[start_index] = planner.VISITING
+        path = [start_index]
+        stack = [iter(edges[start_index])]
+        while stack:
+            index = next(stack[-1], None)
+            if index is None:
+                stack.pop()
+                node_index = path.pop()
+                closure = 0
+                for edge_index in edges[node_index]:
+                    closure |= closures[edge_index] | (1 << edge_index)
+                closures[node_index] = closure
+                states[node_index] = planner.VISITED
+                continue
+
+            if states[index] == planner.VISITING:
+                raise RuntimeError('Dependency cycle detected: ' + planner.format_cycle([names[path_index] for path_index in path], names[index]))
+            if states[index] == planner.VISITED:
+                continue
+
+            states[index] = planner.VISITING
+            path.append(index)
+            stack.append(iter(edges[index]))
+
+    return closures
+
+
+class ModGraph:
+
+    def __init__(self, mod_catalog):
+
+        # Give every mod an index into the bitsets
+        self.names = list(mod_catalog.mods)
+        self.indexes = {name: index for index, name in enumerate(self.names)}
+        self.enabled_mask = 0
+        for mod in mod_catalog.enabled_mods():
+            self.enabled_mask |= 1 << self.indexes[mod.name]
+        self.dependency_mask = 0
+        for mod in mod_catalog.dependency_mods():
+            self.dependency_mask |= 1 << self.indexes[mod.name]
+
+        # Link each mod to its direct dependencies and dependents, ignoring missing mods
+        dependency_edges = [[] for _ in self.names]
+        dependent_edges = [[] for _ in self.names]
+        for mod in mod_catalog.mods.values():
+            index = self.indexes[mod.name]
+            for dependency_name in mod.dependencies:
+                dependency_index = self.indexes.get(dependency_name)
+                if dependency_index is not None:
+                    dependency_edges[index].append(dependency_index)
+                    dependent_edges[dependency_index].append(index)
+
+        # Precompute the transitive closure in both directions
+        self.dependency_closures = close_graph(dependency_edges, self.names)
+        self.dependent_closures = close_graph(dependent_edges, self.names)
+
+        # Note every mod some enabled mod requires
+        self.required_mask = self.enabled_mask
+        for index in get_mask_indexes(self.enabled_mask):
+            self.required_mask |= self.dependency_closures[index]
+
+    def get_index(self, mod_name):
+        if mod_name not in self.indexes:
+            raise RuntimeError('Required mod \"' + mod_name + '\" is missing from project')
+        return self.indexes[mod_name]
+
+    def get_mask(self, mod_names):
+        mask = 0
+        for mod_name in mod_names:
+            mask |= 1 << self.get_index(mod_name)
+        return mask
+
+    def get_names(self, mask):
+
+        # List the names in index order, leaving any sorting to the caller so queries stay cheap
+        return [self.names[index] for index in get_mask_indexes(mask)]
+
+    def dependencies(self, mod_name):
+        return self.get_names(self.dependency_closures[self.get_index(mod_name)])
+
+    def dependents(self, mod_name, enabled_only=False):
+        mask = self.dependent_closures[self.get_index(mod_name)]
+        if enabled_only:
+            mask &= self.enabled_mask
+        return self.get_names(mask)
+
+    def orphans(self):
+        return self.get_names(self.dependency_mask & ~self.required_mask)
+
+    def disable_impact(self, mod_names):
+
+        disabled_mask = self.get_mask(mod_names)
+        remaining_mask = self.enabled_mask & ~disabled_mask
+
+        # Enabled mods that still require a disabled mod would fail to build
+        broken_mask = 0
+        for index in get_mask_indexes(disabled_mask):
+            broken_mask |= self.dependent_closures[index]
+        broken_mask &= remaining_mask
+
+        # A mod is removed once no remaining enabled mod requires it
+        candidate_mask = disabled_mask
+        for index in get_mask_indexes(disabled_mask):
+            candidate_mask |= self.dependency_closures[index]
+        removed_mask = 0
+        for index in get_mask_indexes(candidate_mask & self.required_mask):
+            if (self.dependent_closures[index] | (1 << index)) & remaining_mask == 0:
+                removed_mask |= 1 << index
+
+        return self.get_names(removed_mask), self.get_names(broken_mask)
+
+
+def print_names(title, names):
+    print(title + ' (' + str(len(names)) + ')')
+    for name in sorted(names):
+        print('    ' + name)
+
+
+def run():
+
+    parser = argparse.ArgumentParser(description='Query the project mod dependency graph')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    subparsers.add_parser('dependencies', help='list every mod a mod requires').add_argument('mod')
+    dependents_parser = subparsers.add_parser('dependents', help='list every mod that requires a mod')
+    dependents_parser.add_argument('mod')
+    dependents_parser.add_argument('--enabled', action='store_true', help='only list enabled mods')
+    subparsers.add_parser('orphans', help='list dependency mods that no enabled mod requires')
+    subparsers.add_parser('impact', help='list the mods removed and broken by disabling mods').add_argument('mods', nargs='+')
+    arguments = parser.parse_args()
+
+    # Build the graph from the project mods
+    mod_graph = ModGraph(catalog.ModCatalog(functions.get_project_directory()))
+
+    # Answer the query
+    match arguments.command:
+        case 'dependencies':
+            print_names('Mods required by \"' + arguments.mod + '\"', mod_graph.dependencies(arguments.mod))
+        case 'dependents':
+            print_names('Mods requiring \"' + arguments.mod + '\"', mod_graph.dependents(arguments.mod, arguments.enabled))
+        case 'orphans':
+            print_names('Dependency mods not required by any enabled mod', mod_graph.orphans())
+        case 'impact':
+            removed_mods, broken_mods = mod_graph.disable_impact(arguments.mods)
+            print_names('Mods removed', removed_mods)
+            print_names('Enabled mods still requiring a disabled mod', broken_mods)
+
+
+if __name__ == '__main__':
+    run()
@@ -0,0 +1,127 @@
+import os
+import re
+
+IGNORE_FILENAME = '.gobboignore'
+
+
+def translate_pattern(pattern):
+
+    # Translate the wildcards so that only "**" matches across folders
+    expression = ''
+    index = 0
+    while index < len(pattern):
+        if pattern.startswith('**/', index):
+            expression += '(?:.*/)?'
+            index += 3
+        elif pattern.startswith('**', index):
+            expression += '.*'
+            index += 2
+        elif pattern[index] == '*':
+            expression += '[^/]*'
+            index += 1
+        elif pattern[index] == '?':
+            expression += '[^/]'
+            index += 1
+        else:
+            expression += re.escape(pattern[index])
+            index += 1
+    return expression
+
+
+class IgnoreMatcher:
+
+    def __init__(self, directory, patterns):
+        self.directory = directory
+        self.prefix_length = len(os.path.join(directory, ''))
+
+        # Compile every pattern into one expression for files and one for folders
+        file_expressions = []
+        directory_expressions = []
+        for pattern in patterns:
+
+            # Raise error rather than ignoring a file literally named like a negated pattern
+            if pattern.startswith('!'):
+                raise RuntimeError('Negated pattern \"' + pattern + '\" in the ignore file of \"' + directory + '\" isn\'t supported')
+
+            # Patterns containing a slash before their end, including a leading slash, are relative to the ignore file's folder, others match at any depth
+            directory_only = pattern.endswith('/')
+            anchored = '/' in pattern.rstrip('/')
+            pattern = pattern.strip('/')
+            if anchored:
+                expression = translate_pattern(pattern)
+            else:
+                expression = '(?:.*/)?' + translate_pattern(pattern)
+            directory_expressions.append(expression)
+            if not directory_only:
+                file_expressions.append(expression)
+
+        self.file_pattern = re.compile('|'.join(file_expressions)) if len(file_expressions) > 0 else None
+        self.directory_pattern = re.compile('|'.join(directory_expressions)) if len(directory_expressions) > 0 else None
+
+    def is_ignored(self, path, is_directory=False):
+        pattern = self.directory_pattern if is_directory else self.file_pattern
+        if pattern is None:
+            return False
+        return pattern.fullmatch(path[self.prefix_length:].replace(os.sep, '/')) is not None
+
+
+def load_ignore_file(filepath):
+
+    # Treat a missing ignore file as ignoring nothing
+    try:
+        with open(filepath, 'r', encoding='utf-8') as ignore_file:
+            lines = [line.strip() for line in ignore_file]
+    except FileNotFoundError:
+        return None
+    return IgnoreMatcher(os.path.dirname(filepath), [line for line in lines if len(line) > 0 and not line.startswith('#')])
+
+
+def get_ignore_files(project_directory, directory, inclusive=False):
+
+    # List the ignore files in every folder from the project folder down to the given folder or the folder above it
+    relative_path = os.path.relpath(directory if inclusive else os.path.dirname(directory), project_directory)
+    if relative_path.split(os.sep)[0] == os.pardir:
+        return []
+    directories = [project_directory]
+    for part in relative_path.split(os.sep):
+        if part not in ('', '.'):
+            directories.append(os.path.join(directories[-1], part))
+    return [os.path.join(parent_directory, IGNORE_FILENAME) for parent_directory in directories
+            if os.path.isfile(os.path.join(parent_directory, IGNORE_FILENAME))]
+
+
+def load_matchers(project_directory, directory, inclusive=False):
+    return [load_ignore_file(filepath) for filepath in get_ignore_files(project_directory, directory, inclusive)]
+
+
+def stat_ignore_files(project_directory, directories):
+
+    # Note the ignore files down to each folder so anything listed with them can be checked for changes
+    ignore_files = sorted({filepath for directory in directories for filepath in get_ignore_files(project_directory, directory, True)})
+    return [[filepath, os.stat(filepath).st_size, os.stat(filepath).st_mtime_ns] for filepath in ignore_files]
+
+
+def walk(directory, matchers=()):
+
+    # Walk the tree like os.walk, never entering ignored folders and applying each folder's ignore file to everything below it
+    pending_directories = [(directory, list(matchers))]
+    while pending_directories:
+        root, root_matchers = pending_directories.pop()
+        try:
+            entries = sorted(os.scandir(root), key=lambda entry: entry.name)
+        except OSError:
+            continue
+        if any(entry.name == IGNORE_FILENAME for entry in entries):
+            root_matchers = root_matchers + [load_ignore_file(os.path.join(root, IGNORE_FILENAME))]
+
+        dirs = []
+        filenames = []
+        for entry in entries:
+            if entry.is_dir():
+                if not any(matcher.is_ignored(entry.path, True) for matcher in root_matchers):
+                    dirs.append(entry.name)
+            elif entry.name != IGNORE_FILENAME and not any(matcher.is_ignored(entry.path) for matcher in root_matchers):
+                filenames.append(entry.name)
+        yield root, dirs, filenames
+
+        pending_directories.extend((os.path.join(root, name), root_matchers) for name in reversed(dirs))
@@ -0,0 +1,89 @@
+import concurrent.futures
+import os
+
+import manifest
+
+POINTER_VERSION = 'https://git-lfs.github.com/spec/v1'
+MAX_POINTER_SIZE = 1024
+
+
+def read_pointer(filepath):
+
+    # Pointer files are small text files naming the version, the object's sha256 and its size
+    try:
+        if os.path.getsize(filepath) >= MAX_POINTER_SIZE:
+            return None
+        with open(filepath, 'rb') as f:
+            lines = f.read().decode('utf-8').splitlines()
+    except (OSError, UnicodeDecodeError):
+        return None
+    values = dict(line.partition(' ')[::2] for line in lines if len(line) > 0)
+    if values.get('version') != POINTER_VERSION or not values.get('oid', '').startswith('sha256:') or not values.get('size', '').isdigit():
+        return None
+    return values['oid'][len('sha256:'):], int(values['size'])
+
+
+def get_git_directory(project_directory):
+
+    # Follow a .git file to the real git folder, like in a worktree or submodule
+    git_path = os.path.join(project_directory, '.git')
+    if os.path.isfile(git_path):
+        with open(git_path, 'r', encoding='utf-8') as git_file:
+            git_path = os.path.join(project_directory, git_file.read().strip().removeprefix('gitdir:').strip())
+    return git_path
+
+
+def get_object_directories(project_directory, mirror_directory=None):
+
+    # Look in the local object store first, then in the mirror
+    directories = [os.path.join(get_git_directory(project_directory), 'lfs', 'objects')]
+    if mirror_directory is not None:
+        directories.append(mirror_directory)
+    return directories
+
+
+def find_object(object_directories, oid):
+
+    # Objects are stored under the first two pairs of characters of their sha256, a mirror may also store them flat
+    for directory in object_directories:
+        for filepath in (os.path.join(directory, oid[0:2], oid[2:4], oid), os.path.join(directory, oid)):
+            if os.path.isfile(filepath):
+                return filepath
+    return None
+
+
+def resolve_pointer(source, object_directories, hasher):
+
+    # Return None for a file that isn't a pointer, otherwise the object it points to or the reason it couldn't be used
+    pointer = read_pointer(source)
+    if pointer is None:
+        return None
+    oid, size = pointer
+    object_filepath = find_object(object_directories, oid)
+    if object_filepath is None:
+        return None, oid, 'object ' + oid + ' (' + str(size) + ' bytes) is missing'
+    if os.path.getsize(object_filepath) != size:
+        return None, oid, 'object ' + oid + ' is ' + str(os.path.getsize(object_filepath)) + ' bytes instead of ' + str(size)
+    if hasher.hash(object_filepath) != oid:
+        return None, oid, 'object ' + oid + ' doesn\'t match its sha256'
+    return object_filepath, oid, None
+
+
+def resolve_pointers(sources, object_directories, hasher=None, workers=None):
+
+    # Check every source in parallel, hashing each object found
+    hasher = hasher if hasher is not None else manifest.FileHasher()
+    resolved = {}
+    unresolved = {}
+    with concurrent.futures.ThreadPoolExecutor(workers) as executor:
+        futures = {source: executor.submit(resolve_pointer, source, object_directories, hasher) for source in sorted(set(sources))}
+        for source, future in futures.items():
+            result = future.result()
+            if result is None:
+                continue
+            object_filepath, oid, error = result
+            if error is None:
+                resolved[source] = object_filepath
+            else:
+                unresolved[source] = error
+    return resolved, unresolved
@@ -0,0 +1,133 @@
+import hashlib
+import json
+import os
+import threading
+
+MANIFEST_FILENAME = '.gobbomon_manifest.json'
+HASH_BUFFER_SIZE = 1024 * 1024
+
+
+def hash_file(filepath):
+    digest = hashlib.sha256()
+    with open(filepath, 'rb') as f:
+        while chunk := f.read(HASH_BUFFER_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def stat_file(filepath):
+    try:
+        stat = os.stat(filepath)
+    except FileNotFoundError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class FileHasher:
+
+    def __init__(self, cache_filepath=None):
+        self.hashes = {}
+        self.cache_filepath = cache_filepath
+        self.lock = threading.Lock()
+
+        # Load the hashes of earlier builds, treating a missing or unreadable cache as empty
+        if cache_filepath is not None:
+            try:
+                with open(cache_filepath, 'r') as data:
+                    for filepath, (size, modified, file_hash) in json.load(data).items():
+                        self.hashes[(filepath, (size, modified))] = file_hash
+            except (FileNotFoundError, json.JSONDecodeError, TypeError, ValueError):
+                self.hashes = {}
+
+    def hash(self, filepath):
+
+        # Hash each version of a file once, even when it is written to several targets or built again
+        key = (filepath, stat_file(filepath))
+        with self.lock:
+            file_hash = self.hashes.get(key)
+        if file_hash is None:
+            file_hash = hash_file(filepath)
+            with self.lock:
+                self.hashes[key] = file_hash
+        return file_hash
+
+    def save(self):
+
+        # Keep the latest hash of every file that still exists
+        if self.cache_filepath is None:
+            return
+        hashes = {}
+        with self.lock:
+            for (filepath, stat), file_hash in self.hashes.items():
+                if stat is not None and stat_file(filepath) == stat:
+                    hashes[filepath] = [stat[0], stat[1], file_hash]
+        with open(self.cache_filepath, 'w') as data:
+            data.write(json.dumps(hashes))
+
+
+class Manifest:
+
+    def __init__(self, settings, hasher):
+        self.settings = settings
+        self.hasher = hasher
+        self.files = {}
+
+    def load(self, directory):
+
+        # Treat a missing or unreadable manifest as an empty build
+        try:
+            with open(os.path.join(directory, MANIFEST_FILENAME), 'r') as data:
+                manifest_data = json.load(data)
+            files = manifest_data['Files']
+            settings = manifest_data['Settings']
+        except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+            return False
+
+        # Treat a manifest written with different build settings as an empty build
+        if settings != self.settings:
+            return False
+        self.files = files
+        return True
+
+    def save(self, directory):
+        with open(os.path.join(directory, MANIFEST_FILENAME), 'w') as data:
+            data.write(json.dumps({'Settings': self.settings, 'Files': self.files}, indent=4, sort_keys=True))
+
+    def is_current(self, relative_path, source, destination):
+
+        entry = self.files.get(relative_path)
+        if entry is None:
+            return False
+
+        # Check the last written file hasn't been changed or removed since it was written
+        if stat_file(destination) != (entry['Size'], entry['Modified']):
+            return False
+
+        # Check the same source file still provides the file and hasn't changed since it was written, hashing it when its path or stats have changed
+        source_stat = stat_file(source)
+        if entry.get('Source') == source and source_stat == (entry['Source Size'], entry['Source Modified']):
+            return True
+        if source_stat is None or source_stat[0] != entry['Size'] or self.hasher.hash(source) != entry['Hash']:
+            return False
+        entry['Source'] = source
+        entry['Source Size'], entry['Source Modified'] = source_stat
+        return True
+
+    def create_entry(self, source, destination):
+
+        # Hash the source rather than the destination so a source shared by several targets is only read once
+        size, modified = stat_file(destination)
+        source_size, source_modified = stat_file(source)
+        return {
+            'Size': size,
+            'Modified': modified,
+            'Hash': self.hasher.hash(source),
+            'Source': source,
+            'Source Size': source_size,
+            'Source Modified': source_modified}
+
+    def record(self, relative_path, entry):
+        self.files[relative_path] = entry
+
+    def remove(self, relative_path):
+        del self.files[relative_path]
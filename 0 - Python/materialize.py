@@ -0,0 +1,119 @@
+import concurrent.futures
+import os
+import shutil
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+STRATEGIES = ('copy', 'hardlink', 'reflink', 'symlink')
+DEFAULT_WORKERS = 8
+
+# Only files the game never writes to in place can be shared with the project through a link
+LINKABLE_EXTENSIONS = ('.jar', '.zip')
+
+# Linux ioctl request for cloning a file's extents into another file on copy-on-write filesystems
+FICLONE = 0x40049409
+
+
+def copy_file(source, destination):
+    shutil.copy2(source, destination)
+
+
+def hardlink_file(source, destination):
+    os.link(source, destination)
+
+
+def reflink_file(source, destination):
+    if fcntl is None:
+        raise OSError('Reflinks are not supported on this platform')
+    with open(source, 'rb') as src, open(destination, 'wb') as dst:
+        fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    shutil.copystat(source, destination)
+
+
+def symlink_file(source, destination):
+    os.symlink(os.path.abspath(source), destination)
+
+
+STRATEGY_FUNCTIONS = {
+    'copy': copy_file,
+    'hardlink': hardlink_file,
+    'reflink': reflink_file,
+    'symlink': symlink_file}
+
+
+def remove_file(filepath):
+
+    # Unlink rather than overwrite so a linked destination never writes through to its source
+    try:
+        os.remove(filepath)
+    except FileNotFoundError:
+        pass
+
+
+def materialize_file(source, destination, strategy, link_any_file=False):
+
+    remove_file(destination)
+
+    # Fall back to copying files that can't be safely linked, going by the destination since sources may be stored without an extension
+    if strategy in ('hardlink', 'symlink') and not link_any_file and not destination.lower().endswith(LINKABLE_EXTENSIONS):
+        strategy = 'copy'
+
+    # Fall back to copying the file if the strategy isn't supported by the platform or filesystem
+    if strategy != 'copy':
+        try:
+            STRATEGY_FUNCTIONS[strategy](source, destination)
+            return strategy
+        except OSError:
+            remove_file(destination)
+
+    copy_file(source, destination)
+    return 'copy'
+
+
+def get_file_size(filepath):
+    try:
+        return os.path.getsize(filepath)
+    except OSError:
+        return 0
+
+
+def materialize_files(operations, strategy, workers=DEFAULT_WORKERS, callback=None, cancel_event=None, link_any_file=False, executor=None, materialize_function=None):
+
+    # Write on a worker pool of our own unless given one shared with other writers
+    if executor is None:
+        with concurrent.futures.ThreadPoolExecutor(max(1, workers)) as executor:
+            return materialize_files(operations, strategy, workers, callback, cancel_event, link_any_file, executor, materialize_function)
+    materialize_function = materialize_function if materialize_function is not None else materialize_file
+
+    # Create every destination directory once before any file is written
+    for directory in sorted({os.path.dirname(destination) for source, destination in operations}):
+        os.makedirs(directory, exist_ok=True)
+
+    # Start the largest files first so they don't finish last on a single worker
+    operations = sorted(operations, key=lambda operation: get_file_size(operation[0]), reverse=True)
+
+    def run_operation(source, destination):
+
+        # Skip the remaining files once the build has been cancelled
+        if cancel_event is not None and cancel_event.is_set():
+            return None
+        used_strategy = materialize_function(source, destination, strategy, link_any_file)
+        return used_strategy, callback(source, destination) if callback is not None else None
+
+    # Write the files on the bounded worker pool, collecting the result or error of each file
+    results = {}
+    errors = {}
+    futures = {executor.submit(run_operation, source, destination): destination for source, destination in operations}
+    for future in concurrent.futures.as_completed(futures):
+        try:
+            result = future.result()
+        except OSError as error:
+            errors[futures[future]] = error
+            continue
+        if result is not None:
+            results[futures[future]] = result
+
+    return results, errors
@@ -0,0 +1,337 @@
+import array
+import gzip
+import struct
+import sys
+
+TAG_END = 0
+TAG_BYTE = 1
+TAG_SHORT = 2
+TAG_INT = 3
+TAG_LONG = 4
+TAG_FLOAT = 5
+TAG_DOUBLE = 6
+TAG_BYTE_ARRAY = 7
+TAG_STRING = 8
+TAG_LIST = 9
+TAG_COMPOUND = 10
+TAG_INT_ARRAY = 11
+TAG_LONG_ARRAY = 12
+
+SCALAR_FORMATS = {
+    TAG_BYTE: struct.Struct('>b'),
+    TAG_SHORT: struct.Struct('>h'),
+    TAG_INT: struct.Struct('>i'),
+    TAG_LONG: struct.Struct('>q'),
+    TAG_FLOAT: struct.Struct('>f'),
+    TAG_DOUBLE: struct.Struct('>d')}
+ARRAY_ITEM_SIZES = {TAG_BYTE_ARRAY: 1, TAG_INT_ARRAY: 4, TAG_LONG_ARRAY: 8}
+ARRAY_TYPECODES = {TAG_BYTE_ARRAY: 'b', TAG_INT_ARRAY: 'i', TAG_LONG_ARRAY: 'q'}
+
+UNSIGNED_SHORT = struct.Struct('>H')
+SIGNED_INT = struct.Struct('>i')
+
+# Events yielded by the streaming reader
+EVENT_VALUE = 0
+EVENT_START = 1
+EVENT_END = 2
+
+
+class Tag:
+
+    __slots__ = ('type', 'value', 'item_type')
+
+    def __init__(self, tag_type, value, item_type=TAG_END):
+        self.type = tag_type
+        self.value = value
+        self.item_type = item_type
+
+    def __getitem__(self, key):
+        return self.value[key]
+
+    def __setitem__(self, key, tag):
+        self.value[key] = tag
+
+    def __contains__(self, key):
+        return key in self.value
+
+    def get(self, key, default=None):
+        return self.value.get(key, default)
+
+
+def decode_string(data):
+
+    # Keep any bytes that aren't valid UTF-8 so the string is written back exactly as it was read
+    return bytes(data).decode('utf-8', 'surrogateescape')
+
+
+def encode_string(value):
+    encoded = value.encode('utf-8', 'surrogateescape')
+    return UNSIGNED_SHORT.pack(len(encoded)) + encoded
+
+
+def read_name(data, offset):
+    length = UNSIGNED_SHORT.unpack_from(data, offset)[0]
+    return decode_string(data[offset + 2:offset + 2 + length]), offset + 2 + length
+
+
+def read_array(data, offset, tag_type):
+
+    # Read an array tag straight into a typed array
+    count = SIGNED_INT.unpack_from(data, offset)[0]
+    end = offset + 4 + count * ARRAY_ITEM_SIZES[tag_type]
+    values = array.array(ARRAY_TYPECODES[tag_type])
+    values.frombytes(data[offset + 4:end])
+    if sys.byteorder == 'little' and tag_type != TAG_BYTE_ARRAY:
+        values.byteswap()
+    return values, end
+
+
+def encode_array(values, tag_type):
+    values = array.array(ARRAY_TYPECODES[tag_type], values)
+    if sys.byteorder == 'little' and tag_type != TAG_BYTE_ARRAY:
+        values.byteswap()
+    return SIGNED_INT.pack(len(values)) + values.tobytes()
+
+
+def skip_payload(data, offset, tag_type):
+
+    # Step over a payload without decoding it
+    if tag_type in SCALAR_FORMATS:
+        return offset + SCALAR_FORMATS[tag_type].size
+    if tag_type in ARRAY_ITEM_SIZES:
+        return offset + 4 + SIGNED_INT.unpack_from(data, offset)[0] * ARRAY_ITEM_SIZES[tag_type]
+    if tag_type == TAG_STRING:
+        return offset + 2 + UNSIGNED_SHORT.unpack_from(data, offset)[0]
+    if tag_type == TAG_LIST:
+        item_type = data[offset]
+        count = SIGNED_INT.unpack_from(data, offset + 1)[0]
+        offset += 5
+        if item_type in SCALAR_FORMATS:
+            return offset + max(0, count) * SCALAR_FORMATS[item_type].size
+        for _ in range(count):
+            offset = skip_payload(data, offset, item_type)
+        return offset
+    if tag_type == TAG_COMPOUND:
+        while (item_type := data[offset]) != TAG_END:
+            offset = skip_payload(data, read_name(data, offset + 1)[1], item_type)
+        return offset + 1
+    raise RuntimeError('Unknown NBT tag type ' + str(tag_type))
+
+
+def read_payload(data, offset, tag_type):
+
+    # Decode a payload into plain values, lists and dictionaries
+    if tag_type in SCALAR_FORMATS:
+        return SCALAR_FORMATS[tag_type].unpack_from(data, offset)[0], offset + SCALAR_FORMATS[tag_type].size
+    if tag_type in ARRAY_ITEM_SIZES:
+        return read_array(data, offset, tag_type)
+    if tag_type == TAG_STRING:
+        return read_name(data, offset)
+    if tag_type == TAG_LIST:
+        item_type = data[offset]
+        count = SIGNED_INT.unpack_from(data, offset + 1)[0]
+        offset += 5
+        values = []
+        for _ in range(count):
+            value, offset = read_payload(data, offset, item_type)
+            values.append(value)
+        return values, offset
+    if tag_type == TAG_COMPOUND:
+        values = {}
+        while (item_type := data[offset]) != TAG_END:
+            name, offset = read_name(data, offset + 1)
+            values[name], offset = read_payload(data, offset, item_type)
+        return values, offset + 1
+    raise RuntimeError('Unknown NBT tag type ' + str(tag_type))
+
+
+def iter_events(data):
+
+    # Walk the data without building a tree, yielding (event, tag type, name, value, payload start, payload end) for each tag
+    if data[0] != TAG_COMPOUND:
+        raise RuntimeError('NBT data doesn\'t start with a compound tag')
+    name, offset = read_name(data, 1)
+    yield EVENT_START, TAG_COMPOUND, name, None, offset, None
+
+    # Each open container holds its tag type, the type of its items and the number of list items left
+    containers = [[TAG_COMPOUND, TAG_END, 0]]
+    while containers:
+        container = containers[-1]
+        if container[0] == TAG_COMPOUND:
+            tag_type = data[offset]
+            if tag_type == TAG_END:
+                containers.pop()
+                offset += 1
+                yield EVENT_END, TAG_COMPOUND, None, None, None, offset
+                continue
+            name, offset = read_name(data, offset + 1)
+        else:
+            if container[2] == 0:
+                containers.pop()
+                yield EVENT_END, TAG_LIST, None, None, None, offset
+                continue
+            container[2] -= 1
+            tag_type = container[1]
+            name = None
+
+        start = offset
+        if tag_type == TAG_COMPOUND:
+            containers.append([TAG_COMPOUND, TAG_END, 0])
+            yield EVENT_START, TAG_COMPOUND, name, None, start, None
+        elif tag_type == TAG_LIST:
+            item_type = data[offset]
+            count = max(0, SIGNED_INT.unpack_from(data, offset + 1)[0])
+            offset += 5
+            containers.append([TAG_LIST, item_type, count])
+            yield EVENT_START, TAG_LIST, name, count, start, None
+        else:
+            value, offset = read_payload(data, offset, tag_type)
+            yield EVENT_VALUE, tag_type, name, value, start, offset
+
+
+def read_values(data, names, compounds=()):
+
+    # Read the named tags of the root compound, looking inside the named child compounds and skipping everything else
+    if data[0] != TAG_COMPOUND:
+        raise RuntimeError('NBT data doesn\'t start with a compound tag')
+    values = {}
+    pending_offsets = [read_name(data, 1)[1]]
+    while pending_offsets:
+        offset = pending_offsets.pop()
+        while (tag_type := data[offset]) != TAG_END:
+            name, offset = read_name(data, offset + 1)
+            if name in names:
+                values[name], offset = read_payload(data, offset, tag_type)
+            elif name in compounds and tag_type == TAG_COMPOUND:
+                pending_offsets.append(offset)
+                offset = skip_payload(data, offset, tag_type)
+            else:
+                offset = skip_payload(data, offset, tag_type)
+    return values
+
+
+def find_values(data, names):
+
+    # Find the type and payload offsets of the named tags of the root compound
+    if data[0] != TAG_COMPOUND:
+        raise RuntimeError('NBT data doesn\'t start with a compound tag')
+    offsets = {}
+    offset = read_name(data, 1)[1]
+    while (tag_type := data[offset]) != TAG_END:
+        name, offset = read_name(data, offset + 1)
+        end = skip_payload(data, offset, tag_type)
+        if name in names:
+            offsets[name] = (tag_type, offset, end)
+        offset = end
+    return offsets
+
+
+def read_tag_payload(data, offset, tag_type):
+
+    # Decode a payload into tag nodes, keeping the item type of every list so it can be written back
+    if tag_type in SCALAR_FORMATS:
+        return Tag(tag_type, SCALAR_FORMATS[tag_type].unpack_from(data, offset)[0]), offset + SCALAR_FORMATS[tag_type].size
+    if tag_type in ARRAY_ITEM_SIZES:
+        values, offset = read_array(data, offset, tag_type)
+        return Tag(tag_type, values), offset
+    if tag_type == TAG_STRING:
+        value, offset = read_name(data, offset)
+        return Tag(tag_type, value), offset
+    if tag_type == TAG_LIST:
+        item_type = data[offset]
+        count = SIGNED_INT.unpack_from(data, offset + 1)[0]
+        offset += 5
+        items = []
+        for _ in range(count):
+            item, offset = read_tag_payload(data, offset, item_type)
+            items.append(item)
+        return Tag(tag_type, items, item_type), offset
+    if tag_type == TAG_COMPOUND:
+        values = {}
+        while (item_type := data[offset]) != TAG_END:
+            name, offset = read_name(data, offset + 1)
+            values[name], offset = read_tag_payload(data, offset, item_type)
+        return Tag(tag_type, values), offset + 1
+    raise RuntimeError('Unknown NBT tag type ' + str(tag_type))
+
+
+def read_tag(data):
+
+    # Read the root tag along with its name
+    tag_type = data[0]
+    name, offset = read_name(data, 1)
+    return name, read_tag_payload(data, offset, tag_type)[0]
+
+
+def encode_payload(tag_type, value):
+    if tag_type in SCALAR_FORMATS:
+        return SCALAR_FORMATS[tag_type].pack(value)
+    if tag_type in ARRAY_ITEM_SIZES:
+        return encode_array(value, tag_type)
+    if tag_type == TAG_STRING:
+        return encode_string(value)
+    raise RuntimeError('NBT tag type ' + str(tag_type) + ' isn\'t a single value')
+
+
+def write_tag_payload(output, tag):
+    if tag.type == TAG_COMPOUND:
+        for name, item in tag.value.items():
+            output.append(item.type)
+            output += encode_string(name)
+            write_tag_payload(output, item)
+        output.append(TAG_END)
+    elif tag.type == TAG_LIST:
+        output.append(tag.item_type if len(tag.value) == 0 else tag.value[0].type)
+        output += SIGNED_INT.pack(len(tag.value))
+        for item in tag.value:
+            write_tag_payload(output, item)
+    else:
+        output += encode_payload(tag.type, tag.value)
+
+
+def write_tag(name, tag):
+
+    # Write the root tag in the same layout it was read in
+    output = bytearray()
+    output.append(tag.type)
+    output += encode_string(name)
+    write_tag_payload(output, tag)
+    return bytes(output)
+
+
+def replace_values(data, replacements):
+
+    # Splice new payloads over the tags at the given compound paths, leaving every other byte untouched
+    parts = []
+    last_offset = 0
+    path = []
+    for event, tag_type, name, value, start, end in iter_events(data):
+        if event == EVENT_START:
+            path.append(name)
+        elif event == EVENT_END:
+            path.pop()
+        elif tuple(path[1:]) + (name,) in replacements:
+            parts.append(data[last_offset:start])
+            parts.append(encode_payload(tag_type, replacements[tuple(path[1:]) + (name,)]))
+            last_offset = end
+    parts.append(data[last_offset:])
+    return b''.join(parts)
+
+
+def read_file(filepath):
+
+    # Read a file that may be gzip compressed, like level.dat
+    with open(filepath, 'rb') as f:
+        data = f.read()
+    if data[:2] == b'\x1f\x8b':
+        return gzip.decompress(data), True
+    return data, False
+
+
+def write_file(filepath, data, compressed=True):
+    with open(filepath, 'wb') as f:
+        f.write(gzip.compress(data, mtime=0) if compressed else data)
+
+
+def read_file_values(filepath, names, compounds=()):
+    return read_values(read_file(filepath)[0], names, compounds)
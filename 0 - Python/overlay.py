@@ -0,0 +1,80 @@
+import os
+import re
+
+CONFIG_DIRECTORIES = ('config', 'defaultconfigs')
+SERVER_CONFIG_DIRECTORY = 'serverconfig'
+CHANGELOG_FILENAME = '_changelog.txt'
+
+# Sides a mod can assign its config files to
+FILE_SIDES = ('Client', 'Server', 'Both')
+
+# Config folders and filenames only the client reads
+CLIENT_CONFIG_DIRECTORIES = ('defaultoptions',)
+CLIENT_CONFIG_PATTERN = re.compile(r'(^|[-_.])client([-_.]|$)')
+
+
+def is_config_path(relative_path):
+
+    # Config files live in the top level config folders or a world's server config folder
+    parts = relative_path.split(os.sep)
+    return parts[0] in CONFIG_DIRECTORIES or SERVER_CONFIG_DIRECTORY in parts[:-1]
+
+
+def get_config_side(relative_path, side_overrides=None):
+
+    # Use the side of the longest overridden path containing the file, if there is one
+    if side_overrides:
+        parts = relative_path.split(os.sep)
+        for length in range(len(parts), 0, -1):
+            side = side_overrides.get('/'.join(parts[:length]))
+            if side is not None:
+                return None if side == 'Both' else side
+
+    # Otherwise only treat config files named for the client as client only
+    parts = relative_path.split(os.sep)
+    if parts[0] != 'config':
+        return None
+    if any(part in CLIENT_CONFIG_DIRECTORIES for part in parts[1:-1]):
+        return 'Client'
+    if CLIENT_CONFIG_PATTERN.search(os.path.splitext(parts[-1])[0].lower()):
+        return 'Client'
+    return None
+
+
+def is_changelog_path(relative_path):
+    return os.path.basename(relative_path) == CHANGELOG_FILENAME and os.path.dirname(relative_path) in CONFIG_DIRECTORIES
+
+
+class ConfigOverlay:
+
+    def __init__(self, side=None):
+        self.side = side
+        self.layers = []
+        self.pruned_files = []
+
+    def add_layer(self, name, files, side_overrides=None):
+
+        # Leave out the config changelog files and the files only the other side reads before anything is merged
+        layer_files = []
+        for source, relative_path in files:
+            if is_changelog_path(relative_path):
+                continue
+            config_side = get_config_side(relative_path, side_overrides)
+            if self.side is not None and config_side is not None and config_side != self.side:
+                self.pruned_files.append((source, relative_path))
+                continue
+            layer_files.append((source, relative_path))
+        self.layers.append((name, layer_files))
+
+    def compile(self):
+
+        # Merge the layers in the order they were added, noting every layer that wrote to each replaced file
+        files = {}
+        collisions = {}
+        for name, layer_files in self.layers:
+            for source, relative_path in layer_files:
+                if relative_path in files:
+                    collisions.setdefault(relative_path, [files[relative_path][0]]).append(name)
+                files[relative_path] = (name, source)
+
+        return files, collisions
@@ -0,0 +1,191 @@
+import os
+
+import overlay
+
+VISITING = 1
+VISITED = 2
+
+
+class BuildPlan:
+
+    def __init__(self, side):
+        self.side = side
+        self.mods = []
+        self.files = {}
+
+    def add_mod(self, mod):
+        self.mods.append(mod)
+        self.files[mod.name] = get_mod_files(mod)
+
+
+def list_mod_files(mod):
+
+    relative_files = mod.get_relative_files()
+
+    # Only add config folders that have been changed from their defaults
+    changed_directories = [
+        directory for directory in overlay.CONFIG_DIRECTORIES if os.path.join(directory, overlay.CHANGELOG_FILENAME) in relative_files]
+
+    files = []
+    for relative_path in relative_files:
+        directory = relative_path.split(os.sep)[0]
+        if directory in overlay.CONFIG_DIRECTORIES and directory not in changed_directories:
+            continue
+
+        files.append((os.path.join(mod.directory, relative_path), relative_path))
+
+    return files
+
+
+def get_mod_files(mod):
+
+    # List the files of each mod once, even when it is planned for several targets
+    if mod.files is None:
+        mod.files = list_mod_files(mod)
+    return mod.files
+
+
+def format_cycle(path, mod_name):
+    cycle = path[path.index(mod_name):] + [mod_name]
+    return ' -> '.join('\"' + name + '\"' for name in cycle)
+
+
+def create_build_plans(mod_catalog, sides):
+
+    states = {}
+    ordered_mods = []
+    mod_sides = {}
+
+    for enabled_mod in mod_catalog.enabled_mods():
+
+        # Skip mods that aren't available on any of the sides being planned
+        root_sides = {side for side in sides if enabled_mod.is_available(side)}
+        if len(root_sides) == 0:
+            continue
+        mod_sides.setdefault(enabled_mod.name, set()).update(root_sides)
+        if enabled_mod.name in states:
+            continue
+
+        # Walk the dependency graph depth first once for every side, ordering each mod after all of its dependencies
+        states[enabled_mod.name] = VISITING
+        path = [enabled_mod.name]
+        stack = [(enabled_mod, iter(enabled_mod.dependencies))]
+        while stack:
+            mod, dependencies = stack[-1]
+            dependency_name = next(dependencies, None)
+
+            # Order the mod once all of its dependencies have been ordered
+            if dependency_name is None:
+                stack.pop()
+                path.pop()
+                states[mod.name] = VISITED
+                ordered_mods.append(mod)
+                continue
+
+            state = states.get(dependency_name)
+            if state == VISITED:
+                continue
+            if state == VISITING:
+                raise RuntimeError('Dependency cycle detected: ' + format_cycle(path, dependency_name))
+
+            dependency = mod_catalog.get(dependency_name)
+            states[dependency_name] = VISITING
+            path.append(dependency_name)
+            stack.append((dependency, iter(dependency.dependencies)))
+
+    # Propagate the sides each mod is required on from its dependents to its dependencies
+    for mod in reversed(ordered_mods):
+        required_sides = mod_sides[mod.name]
+        for dependency_name in mod.dependencies:
+            dependency = mod_catalog.mods[dependency_name]
+
+            # Prevent a dependency that isn't available on a required side from being skipped silently
+            if not all(dependency.is_available(side) for side in required_sides):
+                raise RuntimeError('Required mod \"' + dependency_name + '\" was unable to be added')
+            mod_sides.setdefault(dependency_name, set()).update(required_sides)
+
+    # Plan every mod for each side it is required on
+    build_plans = {side: BuildPlan(side) for side in sides}
+    for mod in ordered_mods:
+        for side in mod_sides[mod.name]:
+            build_plans[side].add_mod(mod)
+
+    return build_plans
+
+
+def create_build_plan(mod_catalog, side):
+    return create_build_plans(mod_catalog, [side])[side]
+
+
+def find_cycles(mod_catalog):
+
+    cycles = []
+    states = {}
+
+    # Walk the dependency graph depth first from every mod, reporting each edge back into the current path as a cycle
+    for start_mod in mod_catalog.mods.values():
+        if start_mod.name in states:
+            continue
+        states[start_mod.name] = VISITING
+        path = [start_mod.name]
+        stack = [iter(start_mod.dependencies)]
+        while stack:
+            dependency_name = next(stack[-1], None)
+            if dependency_name is None:
+                stack.pop()
+                states[path.pop()] = VISITED
+                continue
+
+            state = states.get(dependency_name)
+            if state == VISITING:
+                cycles.append(format_cycle(path, dependency_name))
+            if state is not None or dependency_name not in mod_catalog.mods:
+                continue
+
+            states[dependency_name] = VISITING
+            path.append(dependency_name)
+            stack.append(iter(mod_catalog.mods[dependency_name].dependencies))
+
+    return cycles
+
+
+def validate_catalog(mod_catalog, sides):
+
+    problems = []
+    reported_missing_mods = set()
+
+    for side in sides:
+
+        # Walk every mod this side requires, checking each dependency exists and is available on this side
+        visited_mods = set()
+        pending_mods = [mod for mod in mod_catalog.enabled_mods() if mod.is_available(side)]
+        visited_mods.update(mod.name for mod in pending_mods)
+        while pending_mods:
+            mod = pending_mods.pop()
+            for dependency_name in mod.dependencies:
+                dependency = mod_catalog.mods.get(dependency_name)
+                if dependency is None:
+                    if (mod.name, dependency_name) in reported_missing_mods:
+                        continue
+                    reported_missing_mods.add((mod.name, dependency_name))
+                    if dependency_name in mod_catalog.storage_mod_names:
+                        problems.append('Mod \"' + mod.name + '\" requires \"' + dependency_name + '\", which is only in storage')
+                    else:
+                        problems.append('Mod \"' + mod.name + '\" requires \"' + dependency_name + '\", which is missing from project')
+                elif not dependency.is_available(side):
+                    problems.append(side + ' mod \"' + mod.name + '\" requires \"' + dependency_name + '\", which is not a ' + side.lower() + ' mod')
+                elif dependency_name not in visited_mods:
+                    visited_mods.add(dependency_name)
+                    pending_mods.append(dependency)
+
+    # Check every file side names a side, since a misspelt side would leave the file out of both sides
+    for mod in mod_catalog.mods.values():
+        for relative_path, side in sorted(mod.file_sides.items()):
+            if side not in overlay.FILE_SIDES:
+                problems.append('Mod \"' + mod.name + '\" assigns \"' + relative_path + '\" to unknown side \"' + str(side) + '\", expected one of '
+                                + ', '.join('\"' + file_side + '\"' for file_side in overlay.FILE_SIDES))
+
+    # Check the whole dependency graph is acyclic
+    problems.extend('Dependency cycle detected: ' + cycle for cycle in find_cycles(mod_catalog))
+
+    return problems
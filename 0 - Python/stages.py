@@ -0,0 +1,84 @@
+import concurrent.futures
+import os
+import threading
+
+stage_context = threading.local()
+
+
+class Stage:
+
+    def __init__(self, name, outputs, function, *args):
+        self.name = name
+        self.outputs = outputs
+        self.function = function
+        self.args = args
+
+
+def get_current_stage():
+    return getattr(stage_context, 'name', None)
+
+
+def paths_overlap(first_path, second_path):
+
+    # Compare whole path components so "config" doesn't overlap "configs", treating an empty path as the root
+    first_parts = [part for part in os.path.normpath(first_path).split(os.sep) if part not in ('', '.')]
+    second_parts = [part for part in os.path.normpath(second_path).split(os.sep) if part not in ('', '.')]
+    length = min(len(first_parts), len(second_parts))
+    return first_parts[:length] == second_parts[:length]
+
+
+def stages_overlap(first_stage, second_stage):
+    return any(paths_overlap(first_path, second_path) for first_path in first_stage.outputs for second_path in second_stage.outputs)
+
+
+def run_stage(stage, cancel_event):
+
+    # Attribute everything logged by the stage's thread to the stage
+    stage_context.name = stage.name
+    try:
+        return stage.function(*stage.args, cancel_event)
+    finally:
+        stage_context.name = None
+
+
+def run_stages(stages):
+
+    # Each stage waits for every earlier stage that writes to an overlapping path
+    dependencies = {}
+    for index, stage in enumerate(stages):
+        dependencies[stage.name] = [earlier_stage.name for earlier_stage in stages[:index] if stages_overlap(earlier_stage, stage)]
+
+    cancel_event = threading.Event()
+    pending_stages = list(stages)
+    running_stages = {}
+    results = {}
+    failed_stage = None
+    failure = None
+
+    with concurrent.futures.ThreadPoolExecutor(max(1, len(stages))) as executor:
+        while len(pending_stages) > 0 or len(running_stages) > 0:
+
+            # Start every stage whose dependencies have finished, unless a stage has failed
+            if failure is None:
+                for stage in [stage for stage in pending_stages if all(name in results for name in dependencies[stage.name])]:
+                    pending_stages.remove(stage)
+                    running_stages[executor.submit(run_stage, stage, cancel_event)] = stage
+            if len(running_stages) == 0:
+                break
+
+            # Cancel the remaining stages when a stage fails
+            done, _ = concurrent.futures.wait(running_stages, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                stage = running_stages.pop(future)
+                try:
+                    results[stage.name] = future.result()
+                except Exception as error:
+                    if failure is None:
+                        failed_stage = stage
+                        failure = error
+                        cancel_event.set()
+
+    # Raise error from the first stage that failed
+    if failure is not None:
+        raise RuntimeError('Build stage \"' + failed_stage.name + '\" failed: ' + str(failure)) from failure
+    return results
@@ -0,0 +1,209 @@
+import os
+import shutil
+import threading
+
+import ignore
+import manifest
+import materialize
+import overlay
+
+
+def remove_empty_directories(directory, root_directory):
+
+    # Remove each empty parent directory up to the root directory
+    while directory != root_directory and os.path.isdir(directory) and not os.listdir(directory):
+        os.rmdir(directory)
+        directory = os.path.dirname(directory)
+
+
+def list_tree(source_directory, relative_directory='', matchers=()):
+
+    files = []
+    for root, dirs, filenames in ignore.walk(source_directory, matchers):
+        for filename in filenames:
+            source = os.path.join(root, filename)
+            files.append((source, os.path.normpath(os.path.join(relative_directory, os.path.relpath(source, source_directory)))))
+    return files
+
+
+def remove_directory_in_background(directory):
+    threading.Thread(target=shutil.rmtree, args=(directory,), kwargs={'ignore_errors': True}).start()
+
+
+class BuildTarget:
+
+    def __init__(self, directory, staging_directory, strategy='copy', workers=materialize.DEFAULT_WORKERS, hasher=None, side=None, blob_store=None):
+        self.directory = directory
+        self.staging_directory = staging_directory
+        self.old_directory = staging_directory + '.old'
+        self.strategy = strategy
+        self.workers = workers
+        self.manifest = manifest.Manifest({'Strategy': strategy}, hasher if hasher is not None else manifest.FileHasher())
+        self.incremental = False
+        self.files = {}
+        self.side = side
+        self.blob_store = blob_store
+        self.executor = None
+        self.config_overlay = overlay.ConfigOverlay(side)
+        self.stage_outputs = {}
+        self.strategy_counts = {}
+        self.copied_files = 0
+        self.skipped_files = 0
+        self.lock = threading.Lock()
+
+    def load_manifest(self):
+        self.incremental = self.manifest.load(self.directory)
+        return self.incremental
+
+    def add_file(self, stage, source, relative_path):
+
+        # Later files replace earlier files written to the same path
+        self.files[relative_path] = (stage, source)
+        self.stage_outputs.setdefault(stage, set()).add(relative_path.split(os.sep)[0])
+
+    def replace_source(self, relative_path, source):
+        stage = self.files[relative_path][0]
+        self.files[relative_path] = (stage, source)
+
+    def remove_file(self, relative_path):
+        self.files.pop(relative_path, None)
+
+    def add_tree(self, stage, source_directory, relative_directory='', matchers=()):
+        for source, relative_path in list_tree(source_directory, relative_directory, matchers):
+            self.add_file(stage, source, relative_path)
+
+    def add_layer(self, stage, name, files, side_overrides=None):
+
+        # Hold config files back to be merged with every other layer, adding the remaining files directly
+        config_files = []
+        for source, relative_path in files:
+            if overlay.is_config_path(relative_path):
+                config_files.append((source, relative_path))
+            else:
+                self.add_file(stage, source, relative_path)
+        self.config_overlay.add_layer(name, config_files, side_overrides)
+
+    def add_config_files(self, stage):
+
+        # Add the final version of each config file once
+        files, collisions = self.config_overlay.compile()
+        for relative_path, (name, source) in files.items():
+            self.add_file(stage, source, relative_path)
+        return collisions
+
+    def get_stage_files(self):
+
+        # Split the final files between the stages that added them, in the order the stages were added
+        stage_files = {stage: {} for stage in self.stage_outputs}
+        for relative_path, (stage, source) in self.files.items():
+            stage_files[stage][relative_path] = source
+        return stage_files
+
+    def prepare(self):
+
+        # Remove a staging directory or old directory left behind by an interrupted build
+        for directory in (self.staging_directory, self.old_directory):
+            if os.path.exists(directory):
+                shutil.rmtree(directory)
+        os.makedirs(self.staging_directory)
+
+        # Only reuse the existing directory when rebuilding incrementally
+        if not self.incremental:
+            return
+
+        # Link every existing file into the staging directory, except files the last build wrote that are no longer wanted
+        operations = []
+        for root, dirs, filenames in os.walk(self.directory):
+            for filename in filenames:
+                source = os.path.join(root, filename)
+                relative_path = os.path.relpath(source, self.directory)
+                if relative_path == manifest.MANIFEST_FILENAME:
+                    continue
+                if relative_path in self.manifest.files and relative_path not in self.files:
+                    continue
+                operations.append((source, os.path.join(self.staging_directory, relative_path)))
+        results, errors = materialize.materialize_files(operations, 'hardlink', self.workers, link_any_file=True)
+
+        # Raise error listing every file that couldn't be reused
+        if len(errors) > 0:
+            raise RuntimeError('Unable to reuse ' + str(len(errors)) + ' files:\n' + '\n'.join(
+                os.path.relpath(destination, self.staging_directory) + ': ' + str(error) for destination, error in sorted(errors.items())))
+
+    def materialize_from_store(self, source, destination, strategy, link_any_file=False):
+        return self.blob_store.materialize_file(source, destination, strategy, self.manifest.hasher, link_any_file)
+
+    def write_files(self, files, cancel_event=None):
+
+        # Find every file that has changed since the last build
+        operations = []
+        relative_paths = {}
+        for relative_path, source in files.items():
+            destination = os.path.join(self.staging_directory, relative_path)
+            if not self.manifest.is_current(relative_path, source, destination):
+                operations.append((source, destination))
+                relative_paths[destination] = relative_path
+        skipped_files = len(files) - len(operations)
+
+        # Write the changed files in parallel, through the blob store when there is one, and record them in the manifest
+        materialize_function = self.materialize_from_store if self.blob_store is not None else None
+        results, errors = materialize.materialize_files(
+            operations, self.strategy, self.workers, self.manifest.create_entry, cancel_event, executor=self.executor, materialize_function=materialize_function)
+        with self.lock:
+            self.copied_files += len(results)
+            self.skipped_files += skipped_files
+            for destination, (used_strategy, entry) in results.items():
+                self.strategy_counts[used_strategy] = self.strategy_counts.get(used_strategy, 0) + 1
+                self.manifest.record(relative_paths[destination], entry)
+            for destination in errors:
+                self.manifest.files.pop(relative_paths[destination], None)
+
+        # Raise error listing every file that couldn't be written
+        if len(errors) > 0:
+            raise RuntimeError('Unable to write ' + str(len(errors)) + ' files:\n' + '\n'.join(
+                relative_paths[destination] + ': ' + str(error) for destination, error in sorted(errors.items())))
+
+        # Raise error only if the cancel left some of the files unwritten
+        if len(results) < len(operations):
+            raise RuntimeError('Cancelled after writing ' + str(len(results)) + ' files')
+
+        return len(results), skipped_files
+
+    def remove_unwanted_files(self):
+
+        # Remove every file written by the last build that is no longer wanted
+        removed_files = 0
+        for relative_path in [path for path in self.manifest.files if path not in self.files]:
+            destination = os.path.join(self.staging_directory, relative_path)
+            if os.path.lexists(destination):
+                os.remove(destination)
+                remove_empty_directories(os.path.dirname(destination), self.staging_directory)
+            self.manifest.remove(relative_path)
+            removed_files += 1
+        return removed_files
+
+    def commit(self):
+
+        # Save the manifest with the new build, keeping the blobs it uses alive
+        self.manifest.save(self.staging_directory)
+        if self.blob_store is not None:
+            self.blob_store.record_build(self.directory)
+
+        # Move the existing directory out of the way and move the staging directory into its place
+        replaced = os.path.exists(self.directory)
+        if replaced:
+            os.rename(self.directory, self.old_directory)
+        os.makedirs(os.path.dirname(self.directory), exist_ok=True)
+        try:
+            os.rename(self.staging_directory, self.directory)
+        except OSError:
+            if replaced:
+                os.rename(self.old_directory, self.directory)
+            raise
+
+        # Remove the old directory in the background
+        if replaced:
+            remove_directory_in_background(self.old_directory)
+        return replaced
+
+    def discard(self):
+        remove_directory_in_background(self.staging_directory)
@@ -0,0 +1,45 @@
+import os
+import tempfile
+import unittest
+
+import ignore
+
+
+def write_file(filepath, content=''):
+    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    with open(filepath, 'w', encoding='utf-8') as output:
+        output.write(content)
+
+
+class IgnoreTest(unittest.TestCase):
+
+    def setUp(self):
+
+        # Build a project with a root ignore file and a mod holding files left behind by running the game
+        self.temporary_directory = tempfile.TemporaryDirectory()
+        self.project_directory = self.temporary_directory.name
+        self.mods_directory = os.path.join(self.project_directory, '3 - Content Mods')
+        self.mod_directory = os.path.join(self.mods_directory, 'Mod')
+        write_file(os.path.join(self.project_directory, ignore.IGNORE_FILENAME), 'logs/\n*.log\n')
+        write_file(os.path.join(self.mod_directory, 'logs', 'latest.log'))
+        write_file(os.path.join(self.mod_directory, 'mods', 'debug.log'))
+        write_file(os.path.join(self.mod_directory, 'mods', 'mod.jar'))
+
+    def tearDown(self):
+        self.temporary_directory.cleanup()
+
+    def test_root_ignore_file_applies_to_nested_folders(self):
+        root_ignore_file = os.path.join(self.project_directory, ignore.IGNORE_FILENAME)
+        self.assertEqual(ignore.get_ignore_files(self.project_directory, self.mods_directory, True), [root_ignore_file])
+        self.assertEqual(ignore.get_ignore_files(self.project_directory, self.mod_directory), [root_ignore_file])
+        self.assertEqual(ignore.get_ignore_files(self.project_directory, self.project_directory, True), [root_ignore_file])
+
+    def test_root_patterns_skip_files_inside_mods(self):
+        matchers = ignore.load_matchers(self.project_directory, self.mods_directory, True)
+        files = [os.path.relpath(os.path.join(root, filename), self.mod_directory)
+                 for root, dirs, filenames in ignore.walk(self.mod_directory, matchers) for filename in filenames]
+        self.assertEqual(files, [os.path.join('mods', 'mod.jar')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import os
+import tempfile
+import unittest
+
+import nbt
+import world
+
+
+class SanitizeTest(unittest.TestCase):
+
+    def test_player_files(self):
+
+        # Player state is left out wherever it is kept, world state is kept
+        for relative_path in ('playerdata/2152c24e.dat', 'stats/2152c24e.json', 'advancements/2152c24e.json', 'session.lock', 'level.dat_old',
+                              'data/JMPlayerSettings.dat', 'DIM-1/data/JMPlayerSettings.dat'):
+            self.assertTrue(world.is_player_file(relative_path.replace('/', os.sep)), relative_path)
+        for relative_path in ('level.dat', 'data/raids.dat', 'data/WorldUUID.dat', 'DIM1/data/raids_end.dat', 'region/r.0.0.mca', 'serverconfig/forge-server.toml'):
+            self.assertFalse(world.is_player_file(relative_path.replace('/', os.sep)), relative_path)
+
+    def test_sanitize_level(self):
+
+        # Write a level.dat holding a player and the last played time
+        with tempfile.TemporaryDirectory() as directory:
+            source = os.path.join(directory, 'level.dat')
+            destination = os.path.join(directory, 'sanitized', 'level.dat')
+            level = nbt.Tag(nbt.TAG_COMPOUND, {'Data': nbt.Tag(nbt.TAG_COMPOUND, {
+                'LevelName': nbt.Tag(nbt.TAG_STRING, 'Flat World'),
+                'LastPlayed': nbt.Tag(nbt.TAG_LONG, 1700000000000),
+                'Player': nbt.Tag(nbt.TAG_COMPOUND, {'Health': nbt.Tag(nbt.TAG_FLOAT, 20.0)})})})
+            nbt.write_file(source, nbt.write_tag('', level))
+
+            world.sanitize_level(source, destination)
+            data, compressed = nbt.read_file(destination)
+            level_data = nbt.read_tag(data)[1]['Data']
+            self.assertTrue(compressed)
+            self.assertNotIn('Player', level_data)
+            self.assertEqual(level_data['LastPlayed'].value, 0)
+            self.assertEqual(level_data['LevelName'].value, 'Flat World')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,311 @@
+import argparse
+import concurrent.futures
+import gzip
+import json
+import os
+import shutil
+import zlib
+
+import anvil
+import nbt
+
+CHUNK_DIRECTORY = 'region'
+LINKED_DIRECTORIES = ('entities', 'poi')
+FULL_STATUSES = ('full', 'minecraft:full')
+REWRITE_STAMP_FILENAME = '.gobbomon_rewrite.json'
+PLAYER_DIRECTORIES = ('playerdata', 'stats', 'advancements')
+SESSION_FILENAMES = ('session.lock', 'level.dat_old')
+
+# Saved data files mods keep for the last player, the rest of the data folders hold world state like raids and structures and are kept
+PLAYER_DATA_DIRECTORY = 'data'
+PLAYER_DATA_FILENAMES = ('JMPlayerSettings.dat',)
+
+
+def find_dimension_directories(world_directory):
+
+    # Find the overworld and every other dimension that has chunk data
+    dimension_directories = []
+    for root, dirs, filenames in os.walk(world_directory):
+        dirs.sort()
+        if CHUNK_DIRECTORY in dirs:
+            dimension_directories.append(root)
+    return dimension_directories
+
+
+def read_spawn_chunk(world_directory):
+
+    # Treat a world without readable spawn data as spawning at the origin
+    try:
+        values = nbt.read_file_values(os.path.join(world_directory, 'level.dat'), ('SpawnX', 'SpawnZ'), ('Data',))
+    except (OSError, RuntimeError, IndexError, ValueError):
+        return 0, 0
+    return values.get('SpawnX', 0) >> 4, values.get('SpawnZ', 0) >> 4
+
+
+def is_player_file(relative_path):
+
+    # Find the files holding the state of whoever last played the world, relative to the world folder
+    parts = relative_path.split(os.sep)
+    if len(parts) >= 2 and parts[-2] == PLAYER_DATA_DIRECTORY and parts[-1] in PLAYER_DATA_FILENAMES:
+        return True
+    return parts[0] in PLAYER_DIRECTORIES or (len(parts) == 1 and parts[0] in SESSION_FILENAMES)
+
+
+def sanitize_level(source, destination):
+
+    # Remove the singleplayer player and the last played time so every copy of the world starts fresh
+    data, compressed = nbt.read_file(source)
+    name, level = nbt.read_tag(data)
+    level_data = level.get('Data')
+    if level_data is None or level_data.type != nbt.TAG_COMPOUND:
+        raise RuntimeError('\"' + source + '\" has no level data')
+    level_data.value.pop('Player', None)
+    if 'LastPlayed' in level_data:
+        level_data['LastPlayed'].value = 0
+    data = nbt.write_tag(name, level)
+    if compressed:
+        data = gzip.compress(data, mtime=0)
+
+    # Leave an unchanged file untouched so it isn't treated as a new source file
+    if os.path.isfile(destination):
+        with open(destination, 'rb') as f:
+            if f.read() == data:
+                return
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    with open(destination, 'wb') as f:
+        f.write(data)
+
+
+def is_chunk_kept(chunk_data, position, minimum_inhabited_time, spawn_chunk, spawn_radius):
+
+    # Drop chunks that haven't finished generating, they are generated again when they are next loaded
+    values = nbt.read_values(chunk_data, ('Status', 'InhabitedTime'), ('Level',))
+    if values.get('Status') not in FULL_STATUSES:
+        return False
+
+    # Keep every chunk near spawn and every chunk players have spent long enough in
+    if spawn_chunk is not None and max(abs(position[0] - spawn_chunk[0]), abs(position[1] - spawn_chunk[1])) <= spawn_radius:
+        return True
+    return values.get('InhabitedTime', 0) >= minimum_inhabited_time
+
+
+def get_chunk_bytes(region_file, x, z, compression_level=None):
+
+    # Copy the chunk as it is stored unless recompressing it makes it smaller
+    offset = region_file.get_offset(x, z)
+    length, compression = region_file.read_chunk_header(x, z)
+    chunk_bytes = region_file.data[offset:offset + 4 + length]
+    if compression_level is None or compression & anvil.EXTERNAL_FLAG:
+        return chunk_bytes
+    data = zlib.compress(region_file.read_chunk(x, z), compression_level)
+    if len(data) + 1 >= length:
+        return chunk_bytes
+    return (len(data) + 1).to_bytes(4, 'big') + bytes([anvil.COMPRESSION_ZLIB]) + data
+
+
+def write_chunks(destination, chunks):
+
+    # Pack the chunks one after another after the header, leaving no unused sectors
+    locations = [0] * anvil.CHUNK_COUNT
+    timestamps = [0] * anvil.CHUNK_COUNT
+    sector = anvil.HEADER_SIZE // anvil.SECTOR_SIZE
+    with open(destination, 'wb') as f:
+        f.seek(anvil.HEADER_SIZE)
+        for x, z, timestamp, chunk_bytes in chunks:
+            f.write(chunk_bytes)
+
+            # Pad each chunk to a whole number of sectors
+            sector_count = (len(chunk_bytes) + anvil.SECTOR_SIZE - 1) // anvil.SECTOR_SIZE
+            f.write(bytes(sector_count * anvil.SECTOR_SIZE - len(chunk_bytes)))
+            index = anvil.get_chunk_index(x, z)
+            locations[index] = (sector << 8) | min(sector_count, 255)
+            timestamps[index] = timestamp
+            sector += sector_count
+
+        f.seek(0)
+        f.write(b''.join(location.to_bytes(4, 'big') for location in locations))
+        f.write(b''.join(timestamp.to_bytes(4, 'big') for timestamp in timestamps))
+
+
+def write_region_file(region_file, positions, destination, compression_level=None):
+
+    # Copy the kept chunks, dropping every sector no chunk uses
+    external_filenames = [os.path.basename(region_file.get_external_filepath(x, z)) for x, z in positions if region_file.is_external(x, z)]
+    write_chunks(destination, ((x, z, region_file.get_timestamp(x, z), get_chunk_bytes(region_file, x, z, compression_level)) for x, z in positions))
+    return external_filenames
+
+
+def verify_region_file(source_region_file, destination, positions):
+
+    # Check every chunk decompresses to exactly the same data as before, with the same timestamp
+    with anvil.RegionFile(destination) as region_file:
+        if sorted(region_file.chunks()) != sorted(positions):
+            raise RuntimeError('Rewritten region file \"' + destination + '\" has different chunks')
+        for x, z in positions:
+            if region_file.read_chunk(x, z) != source_region_file.read_chunk(x, z) or region_file.get_timestamp(x, z) != source_region_file.get_timestamp(x, z):
+                raise RuntimeError('Chunk ' + str(x) + ', ' + str(z) + ' of rewritten region file \"' + destination + '\" doesn\'t match the original')
+
+
+def rewrite_region_file(source, destination, trim_settings=None, kept_positions=None, compression_level=None):
+
+    with anvil.RegionFile(source) as region_file:
+
+        # Pick the chunks to keep from their own data, from the chunks kept in the matching chunk region, or keep them all
+        positions = []
+        world_positions = []
+        for x, z in region_file.chunks():
+            position = region_file.get_chunk_position(x, z)
+            if kept_positions is not None:
+                kept = position in kept_positions
+            elif trim_settings is not None:
+                kept = is_chunk_kept(region_file.read_chunk(x, z), position, *trim_settings)
+            else:
+                kept = True
+            if kept:
+                positions.append((x, z))
+                world_positions.append(position)
+
+        # Drop region files without any chunks left
+        if len(positions) == 0:
+            return world_positions, [], region_file.size, 0
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        external_filenames = write_region_file(region_file, positions, destination, compression_level)
+        verify_region_file(region_file, destination, positions)
+
+    # Copy the oversized chunks that were kept along with the region file, unless it was rewritten in place
+    if os.path.dirname(os.path.abspath(source)) == os.path.dirname(os.path.abspath(destination)):
+        external_filenames = []
+    for filename in external_filenames:
+        shutil.copyfile(os.path.join(os.path.dirname(source), filename), os.path.join(os.path.dirname(destination), filename))
+    return world_positions, external_filenames, os.path.getsize(source), os.path.getsize(destination)
+
+
+def get_world_stamp(world_directory, settings):
+
+    # Note every region file along with the settings so an unchanged world is only rewritten once
+    files = {}
+    for dimension_directory in find_dimension_directories(world_directory):
+        for directory in (CHUNK_DIRECTORY,) + LINKED_DIRECTORIES:
+            for filepath in anvil.find_region_files(os.path.join(dimension_directory, directory)):
+                stat = os.stat(filepath)
+                files[os.path.relpath(filepath, world_directory)] = [stat.st_size, stat.st_mtime_ns]
+    return {'Settings': settings, 'Files': files}
+
+
+def rewrite_world(world_directory, output_directory, trim_settings=None, compression_level=None, workers=None):
+
+    # Reuse the last rewritten copy if neither the world nor the settings have changed
+    stamp = get_world_stamp(world_directory, [trim_settings, compression_level])
+    stamp_filepath = os.path.join(output_directory, REWRITE_STAMP_FILENAME)
+    try:
+        with open(stamp_filepath, 'r') as data:
+            last_stamp = json.load(data)
+        if last_stamp['Stamp'] == json.loads(json.dumps(stamp)):
+            return last_stamp['Results'], False
+    except (FileNotFoundError, json.JSONDecodeError, KeyError, TypeError):
+        pass
+    if os.path.exists(output_directory):
+        shutil.rmtree(output_directory)
+
+    # Each result holds the rewritten file, or None if it was dropped, along with the size before and after
+    results = {}
+    spawn_chunk = read_spawn_chunk(world_directory)
+
+    def add_result(relative_path, world_positions, external_filenames, source_size, output_size):
+        results[relative_path] = [os.path.join(output_directory, relative_path) if output_size > 0 else None, source_size, output_size]
+        for filename in external_filenames:
+            external_path = os.path.join(os.path.dirname(relative_path), filename)
+            external_size = os.path.getsize(os.path.join(output_directory, external_path))
+            results[external_path] = [os.path.join(output_directory, external_path), external_size, external_size]
+        return world_positions
+
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        for dimension_directory in find_dimension_directories(world_directory):
+
+            # Rewrite the chunk regions of the dimension in parallel, only the overworld is kept around spawn
+            dimension_trim_settings = None
+            if trim_settings is not None:
+                dimension_spawn_chunk = spawn_chunk if dimension_directory == world_directory else None
+                dimension_trim_settings = (trim_settings[0], dimension_spawn_chunk, trim_settings[1])
+            futures = {}
+            for filepath in anvil.find_region_files(os.path.join(dimension_directory, CHUNK_DIRECTORY)):
+                relative_path = os.path.relpath(filepath, world_directory)
+                futures[relative_path] = executor.submit(
+                    rewrite_region_file, filepath, os.path.join(output_directory, relative_path), dimension_trim_settings, None, compression_level)
+            region_positions = {}
+            for relative_path, future in futures.items():
+                for position in add_result(relative_path, *future.result()):
+                    region_positions.setdefault((position[0] >> 5, position[1] >> 5), set()).add(position)
+
+            # Rewrite the entity and point of interest regions, keeping the chunks that were kept in the chunk regions
+            futures = {}
+            for directory in LINKED_DIRECTORIES:
+                for filepath in anvil.find_region_files(os.path.join(dimension_directory, directory)):
+                    relative_path = os.path.relpath(filepath, world_directory)
+                    kept_positions = None
+                    if trim_settings is not None:
+                        match = anvil.REGION_FILENAME_PATTERN.match(os.path.basename(filepath))
+                        kept_positions = region_positions.get((int(match.group(1)), int(match.group(2))), set()) if match is not None else set()
+                    futures[relative_path] = executor.submit(
+                        rewrite_region_file, filepath, os.path.join(output_directory, relative_path), None, kept_positions, compression_level)
+            for relative_path, future in futures.items():
+                add_result(relative_path, *future.result())
+
+            # Drop the oversized chunks of every chunk that wasn't kept
+            for directory in (CHUNK_DIRECTORY,) + LINKED_DIRECTORIES:
+                if os.path.isdir(os.path.join(dimension_directory, directory)):
+                    for filename in os.listdir(os.path.join(dimension_directory, directory)):
+                        relative_path = os.path.relpath(os.path.join(dimension_directory, directory, filename), world_directory)
+                        if filename.endswith('.mcc') and relative_path not in results:
+                            size = os.path.getsize(os.path.join(world_directory, relative_path))
+                            results[relative_path] = [None, size, 0]
+
+    # Remember the rewritten copy for the next build
+    os.makedirs(output_directory, exist_ok=True)
+    with open(stamp_filepath, 'w') as data:
+        data.write(json.dumps({'Stamp': stamp, 'Results': results}))
+
+    return results, True
+
+
+def compact_world(world_directory, compression_level=None, workers=None):
+
+    results = {}
+
+    # Rewrite every region file next to itself and only replace the original once the rewritten file is verified
+    with concurrent.futures.ProcessPoolExecutor(workers) as executor:
+        futures = {}
+        for filepath in anvil.find_region_files(world_directory):
+            if os.path.getsize(filepath) > 0:
+                futures[filepath] = executor.submit(rewrite_region_file, filepath, filepath + '.compacted', None, None, compression_level)
+        for filepath, future in futures.items():
+            world_positions, external_filenames, source_size, output_size = future.result()
+            if output_size == 0 or output_size >= source_size:
+                if os.path.exists(filepath + '.compacted'):
+                    os.remove(filepath + '.compacted')
+                output_size = source_size
+            else:
+                os.replace(filepath + '.compacted', filepath)
+            results[os.path.relpath(filepath, world_directory)] = (source_size, output_size)
+
+    return results
+
+
+def run():
+
+    parser = argparse.ArgumentParser(description='Compact the region files of a world in place')
+    parser.add_argument('world', help='world folder to compact')
+    parser.add_argument('--level', type=int, choices=range(1, 10), help='recompress chunks at this zlib level when it makes them smaller')
+    arguments = parser.parse_args()
+
+    # Report the size change of every region file
+    results = compact_world(arguments.world, arguments.level)
+    for relative_path, (source_size, output_size) in sorted(results.items()):
+        print(relative_path + ': ' + str(source_size) + ' -> ' + str(output_size) + ' bytes (' + format((output_size - source_size) / 1024, '+.0f') + ' KB)')
+    source_size = sum(source_size for source_size, output_size in results.values())
+    output_size = sum(output_size for source_size, output_size in results.values())
+    print('Compacted ' + str(len(results)) + ' region files: ' + format(source_size / 1e6, '.1f') + ' MB -> ' + format(output_size / 1e6, '.1f') + ' MB')
+
+
+if __name__ == '__main__':
+    run()